@@ -0,0 +1,258 @@
+import hashlib
+import inspect
+import os
+import pickle
+from collections import OrderedDict
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+import alphasim.backtest as bt
+import alphasim.stats as stats
+from alphasim.result import BacktestResult
+
+# Bump to invalidate results cached by earlier versions of the engine
+CACHE_VERSION = 1
+
+
+class Uncacheable(Exception):
+    """
+    Raised for args that cannot be identified by content,
+    such as lambdas or objects without a stable representation.
+    """
+
+
+class ResultCache:
+    """
+    Opt-in content-addressed cache of backtest results and stats.
+    Calls are keyed by a hash of the input arrays and all keyword args,
+    with funcs identified by their qualified name and partial args,
+    so repeated calls with the same inputs and params skip the work.
+    Results are held in memory up to a size budget, evicting the least
+    recently used, and also on disk up to a separate budget when a path
+    is given, so they survive the process.
+    Calls with args that cannot be identified, such as a lambda commission
+    func, are computed without caching.
+    Cached objects are returned as is and must not be modified.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 2**20,
+        path: str | os.PathLike | None = None,
+        max_disk_bytes: int = 2**30,
+    ):
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.path = None if path is None else Path(path)
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[Any, int]] = OrderedDict()
+        self._bytes = 0
+
+    def backtest(self, *args: Any, **kwargs: Any) -> pd.DataFrame | BacktestResult:
+        """
+        Cached backtest, taking the same args.
+        """
+        return self.call(bt.backtest, *args, **kwargs)
+
+    def backtest_stats(self, *args: Any, **kwargs: Any) -> pd.DataFrame:
+        """
+        Cached backtest_stats, taking the same args.
+        """
+        return self.call(stats.backtest_stats, *args, **kwargs)
+
+    def call(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Return the cached result of calling func with the args,
+        else call it and cache the result.
+        """
+        try:
+            key = cache_key(func, *args, **kwargs)
+        except Uncacheable:
+            return func(*args, **kwargs)
+
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = func(*args, **kwargs)
+        self.put(key, value)
+        return value
+
+    def get(self, key: str) -> Any | None:
+        """
+        Value of a key from memory, else from disk, or None if not cached.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+        if self.path is None:
+            return None
+
+        file = self.path / f"{key}.pkl"
+        try:
+            with open(file, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+        # Touch the file so disk eviction is least recently used
+        os.utime(file)
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Cache a value in memory and on disk.
+        """
+        self._remember(key, value)
+
+        if self.path is None:
+            return
+
+        file = self.path / f"{key}.pkl"
+        tmp = file.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, file)
+        self._evict_disk()
+
+    def clear(self) -> None:
+        """
+        Remove all cached values from memory and disk.
+        """
+        self._entries.clear()
+        self._bytes = 0
+        if self.path is not None:
+            for file in self.path.glob("*.pkl"):
+                file.unlink(missing_ok=True)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def _remember(self, key: str, value: Any) -> None:
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    def _evict_disk(self) -> None:
+        files = [(f.stat(), f) for f in self.path.glob("*.pkl")]
+        total = sum(st.st_size for st, _ in files)
+        for st, file in sorted(files, key=lambda x: x[0].st_mtime_ns):
+            if total <= self.max_disk_bytes:
+                break
+            file.unlink(missing_ok=True)
+            total -= st.st_size
+
+
+def cache_key(func: Callable, *args: Any, **kwargs: Any) -> str:
+    """
+    Hash identifying a call of func by the content of its args.
+    Args are bound to the signature of func with defaults applied,
+    so the same call gives the same key however the args are passed.
+    Raises Uncacheable if an arg cannot be identified.
+    """
+    try:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+    except TypeError as e:
+        raise Uncacheable(str(e)) from e
+    bound.apply_defaults()
+
+    h = hashlib.blake2b(digest_size=20)
+    _update(h, (CACHE_VERSION, func, bound.arguments))
+    return h.hexdigest()
+
+
+def _update(h: Any, x: Any) -> None:
+    # Feed a type tag then the content of each value
+    match x:
+        case None | bool() | int() | float() | str() | bytes():
+            h.update(f"{type(x).__name__}:{x!r};".encode())
+        case np.generic():
+            h.update(f"{x.dtype.str}:{x!r};".encode())
+        case pd.Timestamp() | pd.Timedelta():
+            h.update(f"{x!r};".encode())
+        case np.ndarray():
+            _update_array(h, x)
+        case pd.DataFrame():
+            h.update(b"frame;")
+            _update(h, (x.index, x.columns))
+            _update_array(h, x.to_numpy())
+        case pd.Series():
+            h.update(b"series;")
+            _update(h, (x.index, x.name))
+            _update_array(h, x.to_numpy())
+        case pd.Index():
+            h.update(b"index;")
+            _update(h, x.names)
+            _update_array(h, x.to_numpy())
+        case BacktestResult():
+            h.update(b"result;")
+            _update(h, vars(x) | {"_frame": None})
+        case partial():
+            h.update(b"partial;")
+            _update(h, (x.func, x.args, sorted(x.keywords.items())))
+        case tuple() | list():
+            h.update(f"{type(x).__name__}:{len(x)};".encode())
+            for item in x:
+                _update(h, item)
+        case dict():
+            h.update(f"dict:{len(x)};".encode())
+            for key, value in sorted(x.items(), key=lambda kv: repr(kv[0])):
+                _update(h, key)
+                _update(h, value)
+        case _ if callable(x) and hasattr(x, "__qualname__"):
+            name = f"{x.__module__}.{x.__qualname__}"
+            if "<lambda>" in name or "<locals>" in name:
+                raise Uncacheable(f"cannot identify {name}")
+            h.update(f"func:{name};".encode())
+        case _:
+            raise Uncacheable(f"cannot identify {type(x).__name__}")
+
+
+def _update_array(h: Any, x: np.ndarray) -> None:
+    h.update(f"array:{x.dtype.str}:{x.shape};".encode())
+    if x.dtype == object:
+        # Objects such as the values of a mixed frame are hashed by pandas
+        x = pd.util.hash_array(x.ravel())
+    h.update(np.ascontiguousarray(x).view(np.uint8).data)
+
+
+def _nbytes(x: Any) -> int:
+    # Approximate memory held by a cached value
+    match x:
+        case pd.DataFrame() | pd.Series():
+            return int(np.sum(x.memory_usage(index=True)))
+        case np.ndarray():
+            return x.nbytes
+        case BacktestResult():
+            arrays = list(x.totals.values()) + [x.cash, x.capital]
+            if x.fields is not None:
+                arrays += list(x.fields.values())
+            if x.venue_cash is not None and x.venue_equity is not None:
+                arrays += [x.venue_cash, x.venue_equity]
+            return sum(a.nbytes for a in arrays)
+        case list() | tuple():
+            return sum(_nbytes(item) for item in x)
+        case _:
+            return 64
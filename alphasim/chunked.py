@@ -0,0 +1,227 @@
+import os
+from collections import deque
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from alphasim.commission import zero_commission
+from alphasim.const import TOTAL_KEYS
+from alphasim.money import initial_capital
+from alphasim.result import BacktestResult
+from alphasim.session import BacktestSession
+from alphasim.store import ResultSink, load_result
+
+Chunk = tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame | None]
+
+
+def backtest_chunked(
+    chunks: Iterable[Chunk],
+    sink: str | os.PathLike | None = None,
+    funding_on_abs_position: bool = False,
+    trade_buffer: float = 0,
+    commission_func: Callable[[float, float], float] = zero_commission,
+    initial_capital: float = 1000,
+    money_func: Callable[[float, float], float] = initial_capital,
+    discrete_shares: bool = False,
+    short_f: float = 1,
+    spread_f: float = 0,
+) -> BacktestResult:
+    """
+    Backtest over chunks of consecutive periods given as tuples of
+    prices, weights and funding rates (or None), such as from frame_chunks,
+    npy_chunks or parquet_chunks.
+    The portfolio and cash are carried across chunk boundaries so the result
+    matches a backtest over the whole history, while peak memory depends on
+    the chunk size.
+    The per asset ledger is written chunk by chunk to the sink directory and
+    returned memory mapped. Without a sink only the totals are kept, which
+    is enough for backtest_stats.
+    """
+    session = None
+    writer = None
+    totals: dict[str, list[np.ndarray]] = {key: [] for key in TOTAL_KEYS}
+    cash: list[np.ndarray] = []
+    capital: list[np.ndarray] = []
+    index: list[pd.Index] = []
+    periods = 0
+    simulated = 0
+
+    try:
+        for prices, weights, funding_rates in chunks:
+            if session is None:
+                session = BacktestSession(
+                    weights.columns,
+                    funding_on_abs_position=funding_on_abs_position,
+                    trade_buffer=trade_buffer,
+                    commission_func=commission_func,
+                    initial_capital=initial_capital,
+                    money_func=money_func,
+                    discrete_shares=discrete_shares,
+                    short_f=short_f,
+                    spread_f=spread_f,
+                )
+                if sink is not None:
+                    writer = ResultSink(sink, session.assets)
+
+            output = "summary" if writer is None else "result"
+            result = session.run(prices, weights, funding_rates, output=output)
+
+            if writer is not None:
+                writer.append(result)
+                continue
+
+            for key in TOTAL_KEYS:
+                totals[key].append(result.totals[key])
+            cash.append(result.cash)
+            capital.append(result.capital)
+            index.append(result.index)
+
+            # Periods after the portfolio is rekt are not simulated
+            if simulated == periods:
+                simulated += result.periods
+            periods += len(result.index)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if session is None:
+        raise ValueError("chunks must not be empty")
+
+    if sink is not None:
+        return load_result(sink)
+
+    return BacktestResult(
+        index[0].append(index[1:]),
+        session.assets,
+        None,
+        {key: np.concatenate(values) for key, values in totals.items()},
+        np.concatenate(cash),
+        np.concatenate(capital),
+        initial_capital,
+        simulated,
+    )
+
+
+def frame_chunks(
+    prices: pd.DataFrame,
+    weights: pd.DataFrame,
+    funding_rates: pd.DataFrame | None = None,
+    chunksize: int = 10_000,
+) -> Iterator[Chunk]:
+    """
+    Split in-memory frames into chunks of periods.
+    """
+    for i in range(0, len(weights), chunksize):
+        rows = slice(i, i + chunksize)
+        funding = None if funding_rates is None else funding_rates.iloc[rows]
+        yield prices.iloc[rows], weights.iloc[rows], funding
+
+
+def npy_chunks(
+    prices_path: str | os.PathLike,
+    weights_path: str | os.PathLike,
+    funding_path: str | os.PathLike | None = None,
+    index: pd.Index | None = None,
+    columns: pd.Index | None = None,
+    chunksize: int = 10_000,
+) -> Iterator[Chunk]:
+    """
+    Read chunks of periods from memory mapped 2-D .npy files of shape
+    (periods, assets), so only the current chunk is loaded in memory.
+    Periods are labelled by the index, else by position.
+    """
+    prices = np.load(prices_path, mmap_mode="r")
+    weights = np.load(weights_path, mmap_mode="r")
+    funding = None if funding_path is None else np.load(funding_path, mmap_mode="r")
+
+    if index is None:
+        index = pd.RangeIndex(len(weights))
+    if columns is None:
+        columns = pd.RangeIndex(weights.shape[1])
+
+    def frame(x: np.ndarray, rows: slice) -> pd.DataFrame:
+        return pd.DataFrame(np.array(x[rows]), index=index[rows], columns=columns)
+
+    for i in range(0, len(weights), chunksize):
+        rows = slice(i, i + chunksize)
+        yield (
+            frame(prices, rows),
+            frame(weights, rows),
+            None if funding is None else frame(funding, rows),
+        )
+
+
+def parquet_chunks(
+    prices_path: str | os.PathLike,
+    weights_path: str | os.PathLike,
+    funding_path: str | os.PathLike | None = None,
+    index_col: str | None = None,
+    chunksize: int = 10_000,
+) -> Iterator[Chunk]:
+    """
+    Read chunks of periods from Parquet files or datasets with a column
+    per asset, streaming record batches so only the current chunk is loaded
+    in memory. The index column, if given, labels the periods.
+    Requires pyarrow.
+    """
+    try:
+        import pyarrow.dataset as ds
+    except ImportError as e:
+        raise ImportError("parquet_chunks requires pyarrow") from e
+
+    paths = [prices_path, weights_path]
+    if funding_path is not None:
+        paths.append(funding_path)
+    datasets = [ds.dataset(path, format="parquet") for path in paths]
+
+    # Row counts are read from the file metadata so sources of different
+    # lengths fail before any chunk is backtested
+    if len({dataset.count_rows() for dataset in datasets}) > 1:
+        raise ValueError("prices, weights and funding rates must have equal rows")
+
+    def frames(dataset: ds.Dataset) -> Iterator[pd.DataFrame]:
+        for batch in dataset.to_batches():
+            df = batch.to_pandas()
+            # Files written from pandas restore their index from the metadata
+            if index_col is not None and index_col in df.columns:
+                df = df.set_index(index_col)
+            yield df
+
+    streams = [_rechunk(frames(dataset), chunksize) for dataset in datasets]
+    for chunk in zip(*streams, strict=True):
+        prices, weights = chunk[0], chunk[1]
+        funding = chunk[2] if funding_path is not None else None
+        yield prices, weights, funding
+
+
+def _rechunk(frames: Iterator[pd.DataFrame], chunksize: int) -> Iterator[pd.DataFrame]:
+    # Batches of different sources are not aligned so cut to a fixed size,
+    # pending batches are sliced by offset and joined once per chunk
+    pending: deque[pd.DataFrame] = deque()
+    rows = 0
+    for frame in frames:
+        pending.append(frame)
+        rows += len(frame)
+        while rows >= chunksize:
+            yield _take(pending, chunksize)
+            rows -= chunksize
+
+    if rows > 0:
+        yield _take(pending, rows)
+
+
+def _take(pending: deque[pd.DataFrame], rows: int) -> pd.DataFrame:
+    # Remove the leading rows from the pending batches
+    parts = []
+    while rows > 0:
+        frame = pending.popleft()
+        if len(frame) > rows:
+            pending.appendleft(frame.iloc[rows:])
+            frame = frame.iloc[:rows]
+        parts.append(frame)
+        rows -= len(frame)
+
+    if len(parts) == 1:
+        return parts[0]
+    return pd.concat(parts)
@@ -1,32 +1,86 @@
+from functools import partial
+from typing import Callable
+
 import numpy as np
 
+CommissionFunc = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+def vectorized(func: Callable) -> Callable:
+    """
+    Mark a commission func as accepting arrays of trade sizes (base quantities)
+    and trade values (quote quantities) and returning an array of fees.
+    """
+    func.vectorized = True
+    return func
+
+
+def as_vectorized(func: Callable) -> CommissionFunc:
+    """
+    Array interface of a commission func.
+    Funcs marked as vectorized, including partials of them, are returned as is.
+    Scalar funcs taking a single trade size and value are wrapped
+    to be called once per trade.
+    """
+    base = func
+    while isinstance(base, partial):
+        base = base.func
+
+    if getattr(base, "vectorized", False):
+        return func
+
+    def wrapped(trade_size: np.ndarray, trade_value: np.ndarray) -> np.ndarray:
+        trade_size = np.asarray(trade_size, dtype=np.float64)
+        trade_value = np.asarray(trade_value, dtype=np.float64)
+        fees = [
+            func(float(x), float(y))
+            for x, y in zip(trade_size.ravel(), trade_value.ravel())
+        ]
+        return np.array(fees, dtype=np.float64).reshape(trade_size.shape)
+
+    return wrapped
+
 
-def zero_commission(trade_size: float, trade_value: float) -> float:
-    return 0
+@vectorized
+def zero_commission(
+    trade_size: float | np.ndarray, trade_value: float | np.ndarray
+) -> float | np.ndarray:
+    if np.ndim(trade_value) == 0:
+        return 0.0
+    return np.zeros_like(trade_value, dtype=float)
 
 
+@vectorized
 def fixed_commission(
-    trade_size: float, trade_value: float, fixed_commission: float
-) -> float:
-    return -fixed_commission
+    trade_size: float | np.ndarray,
+    trade_value: float | np.ndarray,
+    fixed_commission: float,
+) -> float | np.ndarray:
+    if np.ndim(trade_value) == 0:
+        return -float(fixed_commission)
+    return np.full_like(trade_value, -fixed_commission, dtype=float)
 
 
+@vectorized
 def linear_pct_commission(
-    trade_size: float, trade_value: float, pct_commission: float
-) -> float:
-    commission = abs(trade_value) * pct_commission
+    trade_size: float | np.ndarray,
+    trade_value: float | np.ndarray,
+    pct_commission: float,
+) -> float | np.ndarray:
+    commission = np.abs(trade_value) * pct_commission
     return -commission
 
 
+@vectorized
 def tiered_pct_commission(
-    trade_size: float,
-    trade_value: float,
+    trade_size: float | np.ndarray,
+    trade_value: float | np.ndarray,
     min_fee_per_order: float,
     fee_per_unit: float,
     max_pct_per_order: float,
-) -> float:
-    commission = np.min(
-        [abs(trade_size) * fee_per_unit, abs(trade_value) * max_pct_per_order]
+) -> float | np.ndarray:
+    commission = np.minimum(
+        np.abs(trade_size) * fee_per_unit, np.abs(trade_value) * max_pct_per_order
     )
-    commission = np.min([min_fee_per_order, commission])
+    commission = np.minimum(min_fee_per_order, commission)
     return -commission
@@ -13,3 +13,33 @@ FIXED_SLIPPAGE = 0.0001
 TRADE_SIZE_STEP = 0.001
 
 TRADE_SIZE_PREC = 3
+
+CASH = "cash"
+
+EQUITY = "equity"
+
+RESULT_KEYS = [
+    "price",
+    "funding_rate",
+    "start_portfolio",
+    "equity",
+    "start_weight",
+    "target_weight",
+    "adj_target_weight",
+    "adj_delta_weight",
+    "is_trade",
+    "quote_qty",
+    "base_qty",
+    "funding_payment",
+    "commission",
+    "end_portfolio",
+]
+
+TOTAL_KEYS = [
+    "equity",
+    "commission",
+    "funding_payment",
+    "buy_value",
+    "sell_value",
+    "trade_count",
+]
@@ -0,0 +1,702 @@
+from typing import Callable, NamedTuple, Sequence
+
+import numpy as np
+
+import alphasim.money as mn
+from alphasim.commission import CommissionFunc, as_vectorized
+from alphasim.const import EQUITY, RESULT_KEYS, TOTAL_KEYS
+from alphasim.execution import ExecutionFunc
+from alphasim.portfolio import Instruments, allocate_array
+from alphasim.profiling import Profiler
+
+# Periods held without trading are tried as blocks growing from the min size
+# up to the max number of cells of (configs x periods x assets)
+MIN_HOLD_BLOCK = 8
+MAX_HOLD_CELLS = 2**20
+
+
+class Step(NamedTuple):
+    """
+    Records of a single period for one or more parameter sets.
+    Fields map each result key to a (configs x assets) array, or an array
+    of assets when shared by all configurations such as the price.
+    Totals, cash and capital are arrays of configs.
+    Rows select the configurations that are not rekt and so were stepped.
+    Venue cash and equity are (configs x venues) when the engine has venues.
+    Arrays are only valid until the next step of the engine.
+    """
+
+    fields: dict[str, np.ndarray]
+    totals: dict[str, np.ndarray]
+    cash: np.ndarray
+    capital: np.ndarray
+    rows: slice | np.ndarray
+    venue_cash: np.ndarray | None = None
+    venue_equity: np.ndarray | None = None
+
+
+class Simulation(NamedTuple):
+    """
+    Arrays recorded by the engine for one or more parameter sets.
+    Fields hold a (configs x periods x assets) array per result key
+    and are None when the ledger is not recorded.
+    Totals, cash and capital are (configs x periods).
+    Venue cash and equity are (configs x periods x venues) when the engine
+    has venues, else None.
+    """
+
+    fields: dict[str, np.ndarray] | None
+    totals: dict[str, np.ndarray]
+    cash: np.ndarray
+    capital: np.ndarray
+    periods: np.ndarray
+    venue_cash: np.ndarray | None = None
+    venue_equity: np.ndarray | None = None
+
+
+class Block(NamedTuple):
+    """
+    Records of consecutive periods held without trading by all parameter sets.
+    Fields map each result key to a (configs x periods x assets) array,
+    or (periods x assets) when shared by all configurations.
+    Totals, cash and capital are (configs x periods).
+    Venue cash and equity are (configs x periods x venues) when the engine
+    has venues.
+    """
+
+    fields: dict[str, np.ndarray]
+    totals: dict[str, np.ndarray]
+    cash: np.ndarray
+    capital: np.ndarray
+    periods: int
+    venue_cash: np.ndarray | None = None
+    venue_equity: np.ndarray | None = None
+
+
+class Engine:
+    """
+    Simulation state of one or more parameter sets stepped a period at a time.
+    Parameters other than the flags are given per parameter set and broadcast
+    as a leading axis through the allocation math, so many configurations
+    step through the periods together.
+    State carried between periods is the cash balance and the units held
+    of each asset, which can be given to resume a simulation.
+    Instruments, if given, set the lot step, min notional and precision
+    of each asset in place of the lot size.
+    An execution func, if given, prices the fill of each trade given its size
+    and the index of the period, counted from the start of the simulation.
+    Venues, if given, map each asset to the index of the venue it trades on,
+    and the cash flows of each asset are also booked to the (configs x venues)
+    venue cash balances, which start from the given venue cash.
+    Allocation is unchanged and uses the total cash across venues.
+    A profiler, if given, times each stage of a step.
+    """
+
+    def __init__(
+        self,
+        assets: int,
+        funding_on_abs_position: bool,
+        trade_buffer: Sequence[float],
+        commission_func: Sequence[Callable[[float, float], float]],
+        initial_capital: Sequence[float],
+        money_func: Sequence[Callable[[float, float], float]],
+        discrete_shares: bool,
+        short_f: Sequence[float],
+        spread_f: Sequence[float],
+        cash: Sequence[float] | None = None,
+        port: np.ndarray | None = None,
+        profiler: Profiler | None = None,
+        instruments: Instruments | None = None,
+        execution_func: ExecutionFunc | None = None,
+        venues: np.ndarray | None = None,
+        venue_cash: np.ndarray | None = None,
+    ):
+        configs = len(trade_buffer)
+
+        self.assets = assets
+        self.configs = configs
+        self.funding_on_abs_position = funding_on_abs_position
+        self.trade_buffer = np.asarray(trade_buffer, dtype=np.float64)[:, None]
+        self.initial_capital = np.asarray(initial_capital, dtype=np.float64)
+        self.money_func = money_func
+        self.money_groups = _group_money(money_func)
+        self.discrete_shares = discrete_shares
+        self.short_f = np.asarray(short_f, dtype=np.float64)[:, None]
+        self.spread_f = np.asarray(spread_f, dtype=np.float64)[:, None]
+        self.has_spread = bool((self.spread_f > 0).any())
+        self.commission_groups = _group_commission(commission_func)
+        self.profiler = profiler
+        self.instruments = instruments
+        self.execution_func = execution_func
+
+        if (self.trade_buffer < 0).any():
+            raise ValueError("trade_buffer must not be negative")
+
+        if (venues is None) != (venue_cash is None):
+            raise ValueError("venues and venue_cash must be given together")
+
+        # Track cash balance and the units held of each asset
+        if cash is None:
+            cash = initial_capital
+        self.cash = np.array(cash, dtype=np.float64)
+        self.port = np.zeros((configs, assets))
+        if port is not None:
+            self.port[:] = port
+
+        # Cash balance of each venue and the assets traded on each venue
+        self.venues = venues
+        self.venue_cash: np.ndarray | None = None
+        self._venue_assets: list[np.ndarray] = []
+        if venues is not None:
+            self.venue_cash = np.zeros((configs, np.shape(venue_cash)[-1]))
+            self.venue_cash[:] = venue_cash
+            self._venue_assets = [
+                np.flatnonzero(venues == v) for v in range(self.venue_cash.shape[1])
+            ]
+
+        # Number of periods stepped by each configuration before rekt
+        self.periods = np.zeros(configs, dtype=np.int64)
+        self.alive = np.ones(configs, dtype=bool)
+
+        # Index of the next period to step
+        self.period = 0
+
+        self._capital = np.zeros(configs)
+        self._rows: slice | np.ndarray = slice(None)
+
+        # Allocation buffers reused each period
+        self._rebal = tuple(np.empty((configs, assets)) for _ in range(5))
+
+        # Periods where no asset can trade skip allocation when the buffer
+        # is set, their zero quantities and fees are computed once and shared
+        self.sparse = bool((self.trade_buffer > 0).any())
+        self.held = False
+        self._hold: dict[str, np.ndarray] | None = None
+
+    def step(
+        self, price: np.ndarray, funding_rate: np.ndarray, target_weight: np.ndarray
+    ) -> Step | None:
+        """
+        Advance the simulation by one period given arrays of the asset prices,
+        funding rates and target weights.
+        Returns None once all configurations are rekt.
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._step(price, funding_rate, target_weight)
+
+    def _step(
+        self, price: np.ndarray, funding_rate: np.ndarray, target_weight: np.ndarray
+    ) -> Step | None:
+        start_cash = self.cash
+        start_port = self.port
+        alive = self.alive
+        capital = self._capital
+        prof = self.profiler
+
+        # Mark-to-market the portfolio
+        equity = start_port * price
+        total = equity.sum(axis=1) + start_cash
+
+        # Stop simulation of a configuration if rekt
+        rekt = alive & (total <= 0)
+        if rekt.any():
+            alive &= ~rekt
+            self._rows = alive
+        if not alive.any():
+            return None
+        rows = self._rows
+        if prof is not None:
+            prof.lap("mark_to_market")
+
+        for func, ks in self.money_groups:
+            if not isinstance(rows, slice):
+                ks = np.flatnonzero(alive) if isinstance(ks, slice) else ks[alive[ks]]
+            capital[ks] = func(self.initial_capital[ks], total[ks])
+        if prof is not None:
+            prof.lap("money_func")
+
+        # Hold every position without allocating when no asset can trade
+        hold = None
+        if self.sparse:
+            start_weight = np.divide(equity, capital[:, None], out=self._rebal[0])
+            mask = _hold_mask(
+                start_weight, target_weight, start_port, self.trade_buffer, self.short_f
+            )
+            if (mask | ~alive[:, None]).all():
+                hold = self._hold_fields()
+                adj_target_weight = start_weight
+                adj_delta_weight = hold["zero"]
+                base_qty = quote_qty = hold["zero"]
+                if prof is not None:
+                    prof.lap("allocate")
+
+        if hold is None:
+            # Use target weight direction to apply spread factor to the price
+            quote = price
+            if self.has_spread:
+                quote = price + np.sign(target_weight) * (price * self.spread_f / 2)
+            if prof is not None:
+                prof.lap("spread")
+
+            # Allocate using the latest target weights and quote price,
+            # lots are of size 1 in the quote currency or the quote price
+            # itself when only whole shares can be transacted
+            (
+                start_weight,
+                adj_target_weight,
+                adj_delta_weight,
+                base_qty,
+                quote_qty,
+            ) = allocate_array(
+                capital[:, None],
+                quote,
+                equity,
+                target_weight,
+                self.trade_buffer,
+                None if self.discrete_shares else 1.0,
+                self.short_f,
+                out=self._rebal,
+                instruments=self.instruments,
+            )
+
+            # Ensure consistency by filling with zero
+            quote_qty[~np.isfinite(quote_qty)] = 0
+            base_qty[~np.isfinite(base_qty)] = 0
+            if prof is not None:
+                prof.lap("allocate")
+
+            # Force liquidations on a zero target weight
+            liquidate = (np.abs(start_port) > 0) & (target_weight == 0)
+            adj_target_weight[liquidate] = 0
+            adj_delta_weight[liquidate] = (target_weight - start_weight)[liquidate]
+            base_qty[liquidate] = -start_port[liquidate]
+            quote_qty[liquidate] = (base_qty * price)[liquidate]
+            if prof is not None:
+                prof.lap("liquidation")
+
+            # Price fills given the size of each trade, from the quote price
+            # or the price itself for liquidations
+            if self.execution_func is not None:
+                fill = self.execution_func(
+                    np.where(liquidate, price, quote), base_qty, self.period
+                )
+                np.multiply(base_qty, fill, out=quote_qty)
+                quote_qty[~np.isfinite(quote_qty)] = 0
+            if prof is not None:
+                prof.lap("execution")
+
+        # Calc funding payments
+        if self.funding_on_abs_position:
+            funding_payment = np.abs(equity) * funding_rate
+        else:
+            funding_payment = equity * funding_rate
+        if prof is not None:
+            prof.lap("funding")
+
+        if hold is None:
+            commission = self._commission(base_qty, quote_qty)
+            commission_total = commission.sum(axis=1)
+        else:
+            commission = hold["commission"]
+            commission_total = hold["commission_total"]
+        if prof is not None:
+            prof.lap("commission")
+
+        # Update portfolio and cash position of live configurations
+        if hold is None:
+            is_trade = np.abs(base_qty) > 0
+            end_port = start_port + base_qty
+            end_cash = (
+                start_cash
+                + (-quote_qty).sum(axis=1)
+                + commission_total
+                + funding_payment.sum(axis=1)
+            )
+        else:
+            is_trade = hold["is_trade"]
+            end_port = start_port
+            end_cash = start_cash + commission_total + funding_payment.sum(axis=1)
+        if isinstance(rows, slice):
+            self.port, self.cash = end_port, end_cash
+        else:
+            self.port = np.where(alive[:, None], end_port, start_port)
+            self.cash = np.where(alive, end_cash, start_cash)
+        self.periods[alive] += 1
+        self.period += 1
+
+        # Book the cash flows of each asset to the balance of its venue
+        venue_cash = venue_equity = None
+        if self.venue_cash is not None:
+            start_venue_cash = self.venue_cash
+            venue_equity = self._by_venue(equity) + start_venue_cash
+            flows = -quote_qty + commission + funding_payment
+            venue_cash = start_venue_cash + self._by_venue(flows)
+            if isinstance(rows, slice):
+                self.venue_cash = venue_cash
+            else:
+                self.venue_cash = np.where(alive[:, None], venue_cash, start_venue_cash)
+
+        fields = {
+            "price": price,
+            "funding_rate": funding_rate,
+            "start_portfolio": start_port,
+            "equity": equity,
+            "start_weight": start_weight,
+            "target_weight": target_weight,
+            "adj_target_weight": adj_target_weight,
+            "adj_delta_weight": adj_delta_weight,
+            "is_trade": is_trade,
+            "quote_qty": quote_qty,
+            "base_qty": base_qty,
+            "funding_payment": funding_payment,
+            "commission": commission,
+            "end_portfolio": end_port,
+        }
+
+        totals = {
+            EQUITY: total,
+            "commission": commission_total,
+            "funding_payment": funding_payment.sum(axis=1),
+        }
+        if hold is None:
+            abs_quote_qty = np.abs(quote_qty)
+            totals["buy_value"] = np.where(base_qty > 0, abs_quote_qty, 0).sum(axis=1)
+            totals["sell_value"] = np.where(base_qty < 0, abs_quote_qty, 0).sum(axis=1)
+            totals["trade_count"] = is_trade.sum(axis=1)
+        else:
+            totals["buy_value"] = totals["sell_value"] = hold["zero_total"]
+            totals["trade_count"] = hold["trade_count"]
+        self.held = hold is not None
+        if prof is not None:
+            prof.lap("portfolio_update")
+
+        return Step(fields, totals, end_cash, capital, rows, venue_cash, venue_equity)
+
+    def hold(
+        self, prices: np.ndarray, funding_rates: np.ndarray, target_weights: np.ndarray
+    ) -> Block | None:
+        """
+        Advance the simulation through the leading periods of 2-D arrays of
+        asset prices, funding rates and target weights for as long as no
+        configuration would trade, computing those periods as one block.
+        Records match stepping each period, only the mark-to-market
+        and funding change while positions are held.
+        Returns None when the first period would trade, a configuration
+        is rekt or the buffer is not set.
+        """
+        if not self.sparse or not isinstance(self._rows, slice):
+            return None
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._hold_block(prices, funding_rates, target_weights)
+
+    def _hold_block(
+        self, prices: np.ndarray, funding_rates: np.ndarray, target_weights: np.ndarray
+    ) -> Block | None:
+        prof = self.profiler
+        hold = self._hold_fields()
+        port = self.port[:, None, :]
+
+        # Mark-to-market and accrue funding of each period as in step,
+        # cash adds the fees then the funding of each period in turn
+        equity = port * prices
+        if self.funding_on_abs_position:
+            funding_payment = np.abs(equity) * funding_rates
+        else:
+            funding_payment = equity * funding_rates
+        funding_total = funding_payment.sum(axis=2)
+
+        flows = np.empty((self.configs, 2 * len(prices) + 1))
+        flows[:, 0] = self.cash
+        flows[:, 1::2] = hold["commission_total"][:, None]
+        flows[:, 2::2] = funding_total
+        balance = np.add.accumulate(flows, axis=1)
+        total = equity.sum(axis=2) + balance[:, :-1:2]
+
+        # Cut the block before a configuration is rekt
+        live = (total > 0).all(axis=0)
+        periods = len(prices) if live.all() else int(np.argmin(live))
+        if prof is not None:
+            prof.lap("mark_to_market")
+        if periods == 0:
+            return None
+
+        capital = np.empty((self.configs, periods))
+        for func, ks in self.money_groups:
+            capital[ks] = func(self.initial_capital[ks, None], total[ks, :periods])
+        if prof is not None:
+            prof.lap("money_func")
+
+        # Cut the block before the first period that would trade
+        equity = equity[:, :periods]
+        start_weight = equity / capital[:, :, None]
+        mask = _hold_mask(
+            start_weight,
+            target_weights[:periods],
+            port,
+            self.trade_buffer[:, :, None],
+            self.short_f[:, :, None],
+        )
+        held = mask.all(axis=(0, 2))
+        periods = periods if held.all() else int(np.argmin(held))
+        if prof is not None:
+            prof.lap("allocate")
+        if periods == 0:
+            return None
+
+        shape = (self.configs, periods, self.assets)
+        zero = np.broadcast_to(hold["zero"][:, None, :], shape)
+        start_port = np.broadcast_to(port, shape)
+        fields = {
+            "price": prices[:periods],
+            "funding_rate": funding_rates[:periods],
+            "start_portfolio": start_port,
+            "equity": equity[:, :periods],
+            "start_weight": start_weight[:, :periods],
+            "target_weight": target_weights[:periods],
+            "adj_target_weight": start_weight[:, :periods],
+            "adj_delta_weight": zero,
+            "is_trade": np.broadcast_to(hold["is_trade"][:, None, :], shape),
+            "quote_qty": zero,
+            "base_qty": zero,
+            "funding_payment": funding_payment[:, :periods],
+            "commission": np.broadcast_to(hold["commission"][:, None, :], shape),
+            "end_portfolio": start_port,
+        }
+
+        flat = (self.configs, periods)
+        totals = {
+            EQUITY: total[:, :periods],
+            "commission": np.broadcast_to(hold["commission_total"][:, None], flat),
+            "funding_payment": funding_total[:, :periods],
+            "buy_value": np.broadcast_to(hold["zero_total"][:, None], flat),
+            "sell_value": np.broadcast_to(hold["zero_total"][:, None], flat),
+            "trade_count": np.broadcast_to(hold["trade_count"][:, None], flat),
+        }
+
+        end_cash = balance[:, 2 : 2 * periods + 1 : 2]
+        self.cash = end_cash[:, -1].copy()
+
+        # Venue balances add the flows of each period in turn as in step
+        venue_cash = venue_equity = None
+        if self.venue_cash is not None:
+            flows = -zero + fields["commission"] + fields["funding_payment"]
+            venue_flows = np.concatenate(
+                [self.venue_cash[:, None, :], self._by_venue(flows)], axis=1
+            )
+            venue_balance = np.add.accumulate(venue_flows, axis=1)
+            venue_equity = self._by_venue(fields["equity"]) + venue_balance[:, :-1]
+            venue_cash = venue_balance[:, 1:]
+            self.venue_cash = venue_cash[:, -1].copy()
+        self._capital[:] = capital[:, -1]
+        self.periods += periods
+        self.period += periods
+        if prof is not None:
+            prof.lap("portfolio_update")
+
+        return Block(
+            fields,
+            totals,
+            end_cash,
+            capital[:, :periods],
+            periods,
+            venue_cash,
+            venue_equity,
+        )
+
+    def _commission(self, base_qty: np.ndarray, quote_qty: np.ndarray) -> np.ndarray:
+        # Calc commission for all assets of each group of configurations
+        commission = np.empty((self.configs, self.assets))
+        for func, group in self.commission_groups:
+            commission[group] = func(base_qty[group], quote_qty[group])
+        return commission
+
+    def _by_venue(self, values: np.ndarray) -> np.ndarray:
+        # Sum the last axis of assets by venue in the same order for
+        # a step or a block so their balances match
+        return np.stack(
+            [values[..., group].sum(axis=-1) for group in self._venue_assets],
+            axis=-1,
+        )
+
+    def _hold_fields(self) -> dict[str, np.ndarray]:
+        # Read-only fields of a bar without trades, shared by all such bars
+        if self._hold is None:
+            zero = np.zeros((self.configs, self.assets))
+            commission = self._commission(zero, zero)
+            self._hold = {
+                "zero": zero,
+                "is_trade": np.zeros((self.configs, self.assets), dtype=bool),
+                "commission": commission,
+                "commission_total": commission.sum(axis=1),
+                "zero_total": np.zeros(self.configs),
+                "trade_count": np.zeros(self.configs, dtype=np.int64),
+            }
+            for values in self._hold.values():
+                values.setflags(write=False)
+        return self._hold
+
+
+def simulate(
+    prices: np.ndarray,
+    weights: np.ndarray,
+    funding_rates: np.ndarray,
+    engine: Engine,
+    ledger: bool = True,
+) -> Simulation:
+    """
+    Step the engine through 2-D float64 arrays of shape (periods, assets)
+    recording each period.
+    A configuration stops recording once it is rekt and the number of
+    periods simulated is returned for each configuration.
+    After a period held without trading, the following periods are tried
+    as a block with the same positions so runs of periods without trades
+    are computed and recorded together.
+    Stages of each period are timed by the profiler of the engine, if any.
+    """
+    periods, assets = prices.shape
+    configs = engine.configs
+
+    fields = None
+    if ledger:
+        fields = {key: np.zeros((configs, periods, assets)) for key in RESULT_KEYS}
+        fields["is_trade"] = np.zeros((configs, periods, assets), dtype=bool)
+    totals = {key: np.zeros((configs, periods)) for key in TOTAL_KEYS}
+    cash = np.zeros((configs, periods))
+    capital = np.zeros((configs, periods))
+
+    venue_cash = venue_equity = None
+    if engine.venue_cash is not None:
+        venue_cash = np.zeros((configs, periods, engine.venue_cash.shape[1]))
+        venue_equity = np.zeros_like(venue_cash)
+
+    start = engine.periods.copy()
+    prof = engine.profiler
+
+    max_block = max(MAX_HOLD_CELLS // (configs * assets), MIN_HOLD_BLOCK)
+    block = 0
+
+    i = 0
+    while i < periods:
+        if prof is not None:
+            prof.start()
+
+        if block > 0:
+            held = engine.hold(
+                prices[i : i + block],
+                funding_rates[i : i + block],
+                weights[i : i + block],
+            )
+            if held is not None:
+                n = held.periods
+                if fields is not None:
+                    for key, values in held.fields.items():
+                        _record_block(fields[key], i, n, values)
+                for key, values in held.totals.items():
+                    _record_block(totals[key], i, n, values)
+                _record_block(cash, i, n, held.cash)
+                _record_block(capital, i, n, held.capital)
+                if venue_cash is not None:
+                    _record_block(venue_cash, i, n, held.venue_cash)
+                    _record_block(venue_equity, i, n, held.venue_equity)
+                if prof is not None:
+                    prof.lap("result_write")
+
+                # Grow the block while every period is held
+                block = min(block * 2, max_block) if n == block else 0
+                i += n
+                continue
+
+        price, funding_rate, weight = prices[i], funding_rates[i], weights[i]
+        if prof is not None:
+            prof.lap("slicing")
+
+        step = engine.step(price, funding_rate, weight)
+        if step is None:
+            break
+        block = MIN_HOLD_BLOCK if engine.held else 0
+
+        if fields is not None:
+            for key, values in step.fields.items():
+                _record(fields[key], i, step.rows, values)
+        for key, values in step.totals.items():
+            _record(totals[key], i, step.rows, values)
+        _record(cash, i, step.rows, step.cash)
+        _record(capital, i, step.rows, step.capital)
+        if venue_cash is not None:
+            _record(venue_cash, i, step.rows, step.venue_cash)
+            _record(venue_equity, i, step.rows, step.venue_equity)
+        if prof is not None:
+            prof.lap("result_write")
+        i += 1
+
+    return Simulation(
+        fields,
+        totals,
+        cash,
+        capital,
+        engine.periods - start,
+        venue_cash,
+        venue_equity,
+    )
+
+
+def _record(
+    out: np.ndarray, i: int, rows: slice | np.ndarray, values: np.ndarray
+) -> None:
+    # Values without a configuration axis are shared by all configurations
+    if values.ndim == out.ndim - 1:
+        values = values[rows]
+    out[rows, i] = values
+
+
+def _record_block(out: np.ndarray, i: int, n: int, values: np.ndarray) -> None:
+    # Values without a configuration axis are broadcast to all configurations
+    out[:, i : i + n] = values
+
+
+def _hold_mask(
+    start_weight: np.ndarray,
+    target_weight: np.ndarray,
+    start_port: np.ndarray,
+    trade_buffer: np.ndarray,
+    short_f: np.ndarray,
+) -> np.ndarray:
+    """
+    Mask of the assets that allocation would not trade, as the start weight
+    is within the buffer of the target so is kept as the adjusted target,
+    is not trimmed by the short factor and the position is not liquidated.
+    """
+    mask = start_weight >= target_weight - trade_buffer
+    mask &= start_weight <= target_weight + trade_buffer
+    mask &= (start_weight >= 0) | (short_f == 1)
+    mask &= (target_weight != 0) | (start_port == 0)
+    return mask
+
+
+def _group_commission(
+    funcs: Sequence[Callable[[float, float], float]],
+) -> list[tuple[CommissionFunc, slice | np.ndarray]]:
+    # Configurations sharing a commission func are charged in a single call
+    groups: dict[int, list[int]] = {}
+    for k, func in enumerate(funcs):
+        groups.setdefault(id(func), []).append(k)
+
+    if len(groups) == 1:
+        return [(as_vectorized(funcs[0]), slice(None))]
+
+    return [(as_vectorized(funcs[ks[0]]), np.array(ks)) for ks in groups.values()]
+
+
+def _group_money(
+    funcs: Sequence[Callable[[float, float], float]],
+) -> list[tuple[mn.MoneyFunc, slice | np.ndarray]]:
+    # Configurations sharing a money func are sized in a single call
+    groups: dict[int, list[int]] = {}
+    for k, func in enumerate(funcs):
+        groups.setdefault(id(func), []).append(k)
+
+    if len(groups) == 1:
+        return [(mn.as_vectorized(funcs[0]), slice(None))]
+
+    return [(mn.as_vectorized(funcs[ks[0]]), np.array(ks)) for ks in groups.values()]
@@ -0,0 +1,76 @@
+from typing import Callable
+
+import numpy as np
+
+import alphasim.const as const
+
+# Fill prices of the trades of a period given the quote prices, the signed
+# trade sizes in base units and the index of the period in the simulation
+ExecutionFunc = Callable[[np.ndarray, np.ndarray, int], np.ndarray]
+
+
+def fixed_slippage(
+    price: np.ndarray,
+    trade_size: np.ndarray,
+    period: int,
+    slippage: float | np.ndarray = const.FIXED_SLIPPAGE,
+) -> np.ndarray:
+    """
+    Fill at a fixed fraction of the price against the trade,
+    buys pay more and sells receive less.
+    """
+    return price * (1 + np.sign(trade_size) * slippage)
+
+
+def half_spread(
+    price: np.ndarray,
+    trade_size: np.ndarray,
+    period: int,
+    spread_f: float | np.ndarray,
+) -> np.ndarray:
+    """
+    Fill across half the spread given as a fraction of the mid price,
+    in the direction of the trade.
+    """
+    return price * (1 + np.sign(trade_size) * spread_f / 2)
+
+
+def sqrt_impact(
+    price: np.ndarray,
+    trade_size: np.ndarray,
+    period: int,
+    adv: float | np.ndarray,
+    volatility: float | np.ndarray,
+    k: float = 1,
+) -> np.ndarray:
+    """
+    Square-root market impact, the price moves against the trade by
+    a fraction of k times the volatility times the square root of the
+    trade size over the average daily volume in base units.
+    Volume and volatility are given for all assets, per asset in the order
+    of the assets, or as (periods x assets) arrays that vary over time,
+    of which the row of the period is used.
+    """
+    adv, volatility = _at(adv, period), _at(volatility, period)
+    impact = k * volatility * np.sqrt(np.abs(trade_size) / adv)
+    return price * (1 + np.sign(trade_size) * impact)
+
+
+def compose(*funcs: ExecutionFunc) -> ExecutionFunc:
+    """
+    Apply execution funcs in turn, each to the fill price of the last.
+    """
+
+    def composed(price: np.ndarray, trade_size: np.ndarray, period: int) -> np.ndarray:
+        for func in funcs:
+            price = func(price, trade_size, period)
+        return price
+
+    return composed
+
+
+def _at(x: float | np.ndarray, period: int) -> float | np.ndarray:
+    # Row of the period of a (periods x assets) array
+    if np.ndim(x) == 2:
+        return np.asarray(x)[period]
+    return x
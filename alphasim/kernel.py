@@ -0,0 +1,443 @@
+import inspect
+import math
+from functools import partial
+from typing import Callable
+
+import numpy as np
+
+import alphasim.commission as cm
+import alphasim.money as mn
+from alphasim.const import RESULT_KEYS, TOTAL_KEYS
+from alphasim.engine import Simulation
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+HAS_NUMBA = numba is not None
+
+MONEY_FUNCS = [mn.initial_capital, mn.total_equity, mn.sqrt_profit]
+
+COMMISSION_FUNCS = [
+    cm.zero_commission,
+    cm.fixed_commission,
+    cm.linear_pct_commission,
+    cm.tiered_pct_commission,
+]
+
+# Result keys held in the float array of fields, is_trade is held apart
+FLOAT_KEYS = [key for key in RESULT_KEYS if key != "is_trade"]
+
+PRICE, FUNDING_RATE, START_PORTFOLIO, EQUITY = 0, 1, 2, 3
+START_WEIGHT, TARGET_WEIGHT, ADJ_TARGET_WEIGHT, ADJ_DELTA_WEIGHT = 4, 5, 6, 7
+QUOTE_QTY, BASE_QTY, FUNDING_PAYMENT, COMMISSION, END_PORTFOLIO = 8, 9, 10, 11, 12
+
+
+def _jit(func: Callable) -> Callable:
+    if numba is None:
+        return func
+    return numba.njit(cache=True, nogil=True, error_model="numpy")(func)
+
+
+def money_code(func: Callable) -> int | None:
+    """
+    Position of a built-in money func, or None if not built-in.
+    """
+    for code, builtin in enumerate(MONEY_FUNCS):
+        if func is builtin:
+            return code
+    return None
+
+
+def commission_code(func: Callable) -> tuple[int, np.ndarray] | None:
+    """
+    Position of a built-in commission func, or a partial of one,
+    and its fixed args. Returns None if not built-in or a fixed arg
+    is not a scalar, such as a fee per asset.
+    """
+    args: list = []
+    kwargs: dict = {}
+    while isinstance(func, partial):
+        args = list(func.args) + args
+        kwargs = {**func.keywords, **kwargs}
+        func = func.func
+
+    for code, builtin in enumerate(COMMISSION_FUNCS):
+        if func is not builtin:
+            continue
+
+        # Fixed args must leave the trade size and value to the caller
+        size, value = object(), object()
+        try:
+            bound = inspect.signature(func).bind(*args, size, value, **kwargs)
+        except TypeError:
+            return None
+        params = list(bound.arguments.values())
+        if params[:2] != [size, value]:
+            return None
+        if not all(np.ndim(x) == 0 for x in params[2:]):
+            return None
+        return code, np.array(params[2:] + [0.0] * (5 - len(params)), dtype=float)
+
+    return None
+
+
+def supports(
+    money_func: Callable[[float, float], float],
+    commission_func: Callable[[float, float], float],
+) -> bool:
+    """
+    Whether the compiled kernel is installed and can run a backtest with
+    the given money and commission funcs, which must be built-in.
+    """
+    return (
+        HAS_NUMBA
+        and money_code(money_func) is not None
+        and commission_code(commission_func) is not None
+    )
+
+
+def simulate(
+    prices: np.ndarray,
+    weights: np.ndarray,
+    funding_rates: np.ndarray,
+    funding_on_abs_position: bool,
+    trade_buffer: float,
+    commission_func: Callable[[float, float], float],
+    initial_capital: float,
+    money_func: Callable[[float, float], float],
+    discrete_shares: bool,
+    short_f: float,
+    spread_f: float,
+    ledger: bool = True,
+) -> Simulation:
+    """
+    Simulate a single configuration with the compiled kernel, which steps
+    through the periods in one call over 2-D float64 arrays of shape
+    (periods, assets) and records the same values as the engine.
+    Money and commission funcs must be built-in.
+    """
+    if not HAS_NUMBA:
+        raise ImportError("compiled kernel requires numba")
+
+    money = money_code(money_func)
+    commission = commission_code(commission_func)
+    if money is None or commission is None:
+        raise ValueError("money_func and commission_func must be built-in")
+
+    if trade_buffer < 0:
+        raise ValueError("trade_buffer must not be negative")
+
+    periods, assets = prices.shape
+    shape = (len(FLOAT_KEYS), periods, assets) if ledger else (len(FLOAT_KEYS), 0, 0)
+    fields = np.zeros(shape)
+    is_trade = np.zeros(shape[1:], dtype=bool)
+    totals = np.zeros((len(TOTAL_KEYS), periods))
+    cash = np.zeros(periods)
+    capital = np.zeros(periods)
+
+    simulated = _run(
+        prices,
+        weights,
+        funding_rates,
+        funding_on_abs_position,
+        float(trade_buffer),
+        commission[0],
+        commission[1],
+        float(initial_capital),
+        money,
+        discrete_shares,
+        float(short_f),
+        float(spread_f),
+        ledger,
+        fields,
+        is_trade,
+        totals,
+        cash,
+        capital,
+    )
+
+    # Add a leading axis of a single configuration as recorded by the engine
+    sim_fields = None
+    if ledger:
+        sim_fields = {key: fields[j][None] for j, key in enumerate(FLOAT_KEYS)}
+        sim_fields["is_trade"] = is_trade[None]
+        sim_fields = {key: sim_fields[key] for key in RESULT_KEYS}
+
+    return Simulation(
+        sim_fields,
+        {key: totals[j][None] for j, key in enumerate(TOTAL_KEYS)},
+        cash[None],
+        capital[None],
+        np.array([simulated]),
+    )
+
+
+@_jit
+def _block_sum(a: np.ndarray, start: int, n: int) -> float:
+    if n < 8:
+        res = 0.0
+        for i in range(start, start + n):
+            res += a[i]
+        return res
+
+    r0, r1, r2, r3 = a[start], a[start + 1], a[start + 2], a[start + 3]
+    r4, r5, r6, r7 = a[start + 4], a[start + 5], a[start + 6], a[start + 7]
+    i = 8
+    while i < n - (n % 8):
+        j = start + i
+        r0 += a[j]
+        r1 += a[j + 1]
+        r2 += a[j + 2]
+        r3 += a[j + 3]
+        r4 += a[j + 4]
+        r5 += a[j + 5]
+        r6 += a[j + 6]
+        r7 += a[j + 7]
+        i += 8
+    res = ((r0 + r1) + (r2 + r3)) + ((r4 + r5) + (r6 + r7))
+    while i < n:
+        res += a[start + i]
+        i += 1
+    return res
+
+
+@_jit
+def _sum(a: np.ndarray) -> float:
+    # Sum in the same order as numpy so totals are bit-compatible,
+    # numpy reduces buffers of up to 8192 values by pairwise summation
+    res = 0.0
+    for start in range(0, len(a), 8192):
+        res += _pairwise_sum(a, start, min(8192, len(a) - start))
+    return res
+
+
+@_jit
+def _pairwise_sum(a: np.ndarray, start: int, n: int) -> float:
+    # Split in halves down to blocks of 128 values, walking the halves
+    # with a stack as recursive functions cannot be cached
+    starts = np.empty(64, dtype=np.int64)
+    sizes = np.empty(64, dtype=np.int64)
+    phases = np.zeros(64, dtype=np.int64)
+    lefts = np.empty(64)
+
+    sp = 0
+    starts[0] = start
+    sizes[0] = n
+    phases[0] = 0
+    ret = 0.0
+    returned = False
+
+    while True:
+        if returned:
+            if sp < 0:
+                return ret
+            half = sizes[sp] // 2
+            half -= half % 8
+            if phases[sp] == 1:
+                lefts[sp] = ret
+                phases[sp] = 2
+                sp += 1
+                starts[sp] = starts[sp - 1] + half
+                sizes[sp] = sizes[sp - 1] - half
+                phases[sp] = 0
+                returned = False
+            else:
+                ret = lefts[sp] + ret
+                sp -= 1
+        elif sizes[sp] <= 128:
+            ret = _block_sum(a, starts[sp], sizes[sp])
+            sp -= 1
+            returned = True
+        else:
+            half = sizes[sp] // 2
+            half -= half % 8
+            phases[sp] = 1
+            sp += 1
+            starts[sp] = starts[sp - 1]
+            sizes[sp] = half
+            phases[sp] = 0
+
+
+@_jit
+def _remainder(a: float, b: float) -> float:
+    # Remainder with the sign of the divisor as np.remainder
+    if b == 0 or np.isnan(b) or not np.isfinite(a):
+        return np.nan
+    mod = np.fmod(a, b)
+    if mod != 0:
+        if (b < 0) != (mod < 0):
+            mod += b
+    else:
+        mod = math.copysign(0.0, b)
+    return mod
+
+
+@_jit
+def _money(code: int, initial: float, total: float) -> float:
+    if code == 0:
+        return initial
+    if code == 1:
+        return total
+    return initial * math.sqrt(1 + (total - initial) / initial)
+
+
+@_jit
+def _commission(code: int, params: np.ndarray, size: float, value: float) -> float:
+    if code == 0:
+        return abs(value) * 0
+    if code == 1:
+        return abs(value) * 0 - params[0]
+    if code == 2:
+        return -(abs(value) * params[0])
+    fee = abs(size) * params[1]
+    cap = abs(value) * params[2]
+    if cap < fee or np.isnan(cap):
+        fee = cap
+    if params[0] < fee or np.isnan(params[0]):
+        fee = params[0]
+    return -fee
+
+
+@_jit
+def _run(
+    prices,
+    weights,
+    funding_rates,
+    funding_on_abs_position,
+    trade_buffer,
+    commission,
+    commission_params,
+    initial_capital,
+    money,
+    discrete_shares,
+    short_f,
+    spread_f,
+    ledger,
+    fields,
+    is_trade,
+    totals,
+    cash_out,
+    capital_out,
+):
+    periods, assets = prices.shape
+
+    cash = initial_capital
+    port = np.zeros(assets)
+    equity = np.empty(assets)
+    neg_quote = np.empty(assets)
+    funding = np.empty(assets)
+    fees = np.empty(assets)
+    buys = np.empty(assets)
+    sells = np.empty(assets)
+
+    # Fee charged on assets that are not traded
+    zero_fee = _commission(commission, commission_params, 0.0, 0.0)
+
+    for i in range(periods):
+        price = prices[i]
+        target = weights[i]
+        rate = funding_rates[i]
+
+        # Mark-to-market the portfolio and stop if rekt
+        for j in range(assets):
+            equity[j] = port[j] * price[j]
+        total = _sum(equity) + cash
+        if total <= 0:
+            return i
+
+        capital = _money(money, initial_capital, total)
+
+        trades = 0
+        for j in range(assets):
+            w = target[j]
+
+            # Use target weight direction to apply spread factor to the price
+            quote = price[j]
+            if spread_f > 0:
+                quote = price[j] + np.sign(w) * (price[j] * spread_f / 2)
+
+            # Clip to the buffer, trim the short side and discretize the delta
+            start_weight = equity[j] / capital
+            adj_target = start_weight
+            lower = w - trade_buffer
+            upper = w + trade_buffer
+            if adj_target < lower:
+                adj_target = lower
+            if adj_target > upper:
+                adj_target = upper
+            if adj_target < 0:
+                adj_target = adj_target * short_f
+            adj_delta = adj_target - start_weight
+
+            # Positions held within the buffer have nothing to discretize
+            quote_qty = 0.0
+            base_qty = 0.0
+            if adj_delta != 0:
+                lot = quote if discrete_shares else 1.0
+                budget = np.rint(adj_delta * capital)
+                budget = (budget - _remainder(budget, lot)) / lot
+                quote_qty = budget * lot
+                base_qty = quote_qty / quote
+                if not np.isfinite(quote_qty):
+                    quote_qty = 0.0
+                if not np.isfinite(base_qty):
+                    base_qty = 0.0
+
+            # Force liquidations on a zero target weight
+            if abs(port[j]) > 0 and w == 0:
+                adj_target = 0.0
+                adj_delta = w - start_weight
+                base_qty = -port[j]
+                quote_qty = base_qty * price[j]
+
+            if funding_on_abs_position:
+                funding[j] = abs(equity[j]) * rate[j]
+            else:
+                funding[j] = equity[j] * rate[j]
+
+            if base_qty == 0 and quote_qty == 0:
+                fees[j] = zero_fee
+            else:
+                fees[j] = _commission(
+                    commission, commission_params, base_qty, quote_qty
+                )
+            neg_quote[j] = -quote_qty
+            buys[j] = abs(quote_qty) if base_qty > 0 else 0.0
+            sells[j] = abs(quote_qty) if base_qty < 0 else 0.0
+            trade = abs(base_qty) > 0
+            trades += trade
+
+            if ledger:
+                fields[PRICE, i, j] = price[j]
+                fields[FUNDING_RATE, i, j] = rate[j]
+                fields[START_PORTFOLIO, i, j] = port[j]
+                fields[EQUITY, i, j] = equity[j]
+                fields[START_WEIGHT, i, j] = start_weight
+                fields[TARGET_WEIGHT, i, j] = w
+                fields[ADJ_TARGET_WEIGHT, i, j] = adj_target
+                fields[ADJ_DELTA_WEIGHT, i, j] = adj_delta
+                fields[QUOTE_QTY, i, j] = quote_qty
+                fields[BASE_QTY, i, j] = base_qty
+                fields[FUNDING_PAYMENT, i, j] = funding[j]
+                fields[COMMISSION, i, j] = fees[j]
+                fields[END_PORTFOLIO, i, j] = port[j] + base_qty
+                is_trade[i, j] = trade
+
+            port[j] = port[j] + base_qty
+
+        commission_total = _sum(fees)
+        funding_total = _sum(funding)
+        cash = ((cash + _sum(neg_quote)) + commission_total) + funding_total
+
+        totals[0, i] = total
+        totals[1, i] = commission_total
+        totals[2, i] = funding_total
+        totals[3, i] = _sum(buys)
+        totals[4, i] = _sum(sells)
+        totals[5, i] = trades
+        cash_out[i] = cash
+        capital_out[i] = capital
+
+    return periods
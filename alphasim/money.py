@@ -1,7 +1,50 @@
-import math
+from functools import partial
+from typing import Callable
 
+import numpy as np
 
-def initial_capital(initial: float, total: float) -> float:
+# Investable capital of each configuration given arrays of the initial
+# capital and the marked-to-market total equity
+MoneyFunc = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+def vectorized(func: Callable) -> Callable:
+    """
+    Mark a money func as accepting arrays of initial capital and total equity
+    and returning an array of the investable capital.
+    """
+    func.vectorized = True
+    return func
+
+
+def as_vectorized(func: Callable) -> MoneyFunc:
+    """
+    Array interface of a money func.
+    Funcs marked as vectorized, including partials of them, are returned as is.
+    Scalar funcs taking a single initial capital and total equity
+    are wrapped to be called once per element.
+    """
+    base = func
+    while isinstance(base, partial):
+        base = base.func
+
+    if getattr(base, "vectorized", False):
+        return func
+
+    def wrapped(initial: np.ndarray, total: np.ndarray) -> np.ndarray:
+        initial, total = np.broadcast_arrays(
+            np.asarray(initial, dtype=np.float64), np.asarray(total, dtype=np.float64)
+        )
+        capital = [func(float(x), float(y)) for x, y in zip(initial.flat, total.flat)]
+        return np.array(capital, dtype=np.float64).reshape(total.shape)
+
+    return wrapped
+
+
+@vectorized
+def initial_capital(
+    initial: float | np.ndarray, total: float | np.ndarray
+) -> float | np.ndarray:
     """
     Money is initial stake only.
     No reinvestment of profits.
@@ -9,18 +52,27 @@ def initial_capital(initial: float, total: float) -> float:
     return initial
 
 
-def total_equity(initial: float, total: float) -> float:
+@vectorized
+def total_equity(
+    initial: float | np.ndarray, total: float | np.ndarray
+) -> float | np.ndarray:
     """
     Money is reinvestment of all profits.
     """
     return total
 
 
-def sqrt_profit(initial: float, total: float) -> float:
+@vectorized
+def sqrt_profit(
+    initial: float | np.ndarray, total: float | np.ndarray
+) -> float | np.ndarray:
     """
     Money is a function of the sqrt of the capital growth rate.
     Partial reinvestment of profits guards against likelihood of
     increasingly severe drawdowns as equity grows.
     See https://zorro-project.com/manual/en/tutorial_kelly.htm
     """
-    return initial * math.sqrt(1 + (total - initial) / initial)
+    capital = initial * np.sqrt(1 + (total - initial) / initial)
+    if np.ndim(capital) == 0:
+        return float(capital)
+    return capital
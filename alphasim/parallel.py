@@ -0,0 +1,133 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+import alphasim.const as const
+from alphasim.backtest import backtest
+from alphasim.result import BacktestResult
+from alphasim.stats import backtest_stats
+
+OUTPUTS = ["stats", "frame", "result", "summary"]
+
+# Chunks of jobs in flight per worker, later chunks are submitted as they complete
+MAX_PENDING_PER_WORKER = 2
+
+# Shared inputs attached by each worker process on start up
+_shared: dict[str, Any] = {}
+
+
+def backtest_parallel(
+    prices: pd.DataFrame,
+    jobs: Iterable[tuple[pd.DataFrame, dict[str, Any]]],
+    funding_rates: pd.DataFrame | None = None,
+    output: str = "stats",
+    max_workers: int | None = None,
+    chunksize: int = 1,
+    freq: int = 1,
+    freq_unit: str = "D",
+    trading_days_year: int = const.TRADING_DAYS_YEAR,
+) -> Iterator[tuple[int, pd.DataFrame | BacktestResult]]:
+    """
+    Run independent backtests across a pool of processes.
+    Each job is a tuple of weights and backtest keyword args run against the
+    shared prices and funding rates, which are sent to the workers once
+    through shared memory rather than pickled with every job.
+    Jobs are validated before any is run, then sent to the workers in chunks
+    of the given size, with a bounded number of chunks in flight.
+    Yields the position of the job and its stats, frame, result or summary as each
+    chunk completes, so results arrive out of order.
+    """
+    if output not in OUTPUTS:
+        raise ValueError(f"output must be one of {OUTPUTS}")
+
+    if chunksize < 1:
+        raise ValueError("chunksize must be greater than 0")
+
+    jobs = list(jobs)
+    for _, kwargs in jobs:
+        if {"funding_rates", "output"} & set(kwargs):
+            raise ValueError("job kwargs must not include funding_rates or output")
+
+    stats_kwargs = dict(
+        freq=freq, freq_unit=freq_unit, trading_days_year=trading_days_year
+    )
+
+    blocks: list[SharedMemory] = []
+    try:
+        shared = {"prices": _share(prices, blocks)}
+        if funding_rates is not None:
+            shared["funding_rates"] = _share(funding_rates, blocks)
+
+        with ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_attach, initargs=(shared,)
+        ) as executor:
+            workers = max_workers or os.cpu_count() or 1
+            limit = workers * MAX_PENDING_PER_WORKER
+            numbered = enumerate(jobs)
+            pending: set[Future] = set()
+            while True:
+                while len(pending) < limit and (
+                    chunk := list(islice(numbered, chunksize))
+                ):
+                    pending.add(executor.submit(_run, chunk, output, stats_kwargs))
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def _share(x: pd.DataFrame, blocks: list[SharedMemory]) -> dict[str, Any]:
+    values = np.ascontiguousarray(x.to_numpy(dtype=np.float64))
+    block = SharedMemory(create=True, size=max(values.nbytes, 1))
+    blocks.append(block)
+    np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+
+    return {
+        "name": block.name,
+        "shape": values.shape,
+        "index": x.index,
+        "columns": x.columns,
+    }
+
+
+def _attach(shared: dict[str, dict[str, Any]]) -> None:
+    for key, spec in shared.items():
+        block = SharedMemory(name=spec["name"])
+        values = np.ndarray(spec["shape"], dtype=np.float64, buffer=block.buf)
+        _shared[key] = pd.DataFrame(
+            values, index=spec["index"], columns=spec["columns"], copy=False
+        )
+        # Keep a reference so the mapping outlives the frame construction
+        _shared[f"{key}_block"] = block
+
+
+def _run(
+    chunk: list[tuple[int, tuple[pd.DataFrame, dict[str, Any]]]],
+    output: str,
+    stats_kwargs: dict[str, Any],
+) -> list[tuple[int, pd.DataFrame | BacktestResult]]:
+    done = []
+    for i, (weights, kwargs) in chunk:
+        result = backtest(
+            _shared["prices"],
+            weights,
+            funding_rates=_shared.get("funding_rates"),
+            output="summary" if output == "stats" else output,
+            **kwargs,
+        )
+        if output == "stats":
+            result = backtest_stats(result, **stats_kwargs)
+        done.append((i, result))
+
+    return done
@@ -1,9 +1,87 @@
-from typing import cast
+import warnings
+from typing import NamedTuple, Sequence, cast
 
 import numpy as np
 import pandas as pd
 from scipy.optimize import minimize
 
+import alphasim.const as const
+
+# Columns of an instrument table and their defaults,
+# a NaN price precision leaves prices unrounded
+INSTRUMENT_DEFAULTS = {
+    "lot_step": const.TRADE_SIZE_STEP,
+    "size_precision": const.TRADE_SIZE_PREC,
+    "min_notional": 0.0,
+    "price_precision": np.nan,
+}
+
+
+class Instruments(NamedTuple):
+    """
+    Trading constraints of each asset as arrays aligned to the assets.
+    Lot step is the smallest tradable quantity in base units and trade sizes
+    are rounded to the size precision in decimals.
+    Orders with a value below the min notional in quote units are not placed.
+    Prices are rounded to the price precision in decimals.
+    """
+
+    lot_step: np.ndarray
+    size_precision: np.ndarray
+    min_notional: np.ndarray
+    price_precision: np.ndarray
+
+
+def instrument_table(
+    assets: Sequence[str] | pd.Index,
+    lot_step: float | Sequence[float] = const.TRADE_SIZE_STEP,
+    size_precision: int | Sequence[int] = const.TRADE_SIZE_PREC,
+    min_notional: float | Sequence[float] = 0,
+    price_precision: float | Sequence[float] = np.nan,
+) -> pd.DataFrame:
+    """
+    Instrument table with a row per asset, values are given
+    per asset or as a single value for all assets.
+    """
+    return pd.DataFrame(
+        {
+            "lot_step": lot_step,
+            "size_precision": size_precision,
+            "min_notional": min_notional,
+            "price_precision": price_precision,
+        },
+        index=pd.Index(assets),
+        dtype=np.float64,
+    )
+
+
+def to_instruments(
+    table: pd.DataFrame, assets: Sequence[str] | pd.Index
+) -> Instruments:
+    """
+    Align an instrument table to the assets, columns not in the table
+    take their defaults.
+    """
+    unknown = set(table.columns) - set(INSTRUMENT_DEFAULTS)
+    if unknown:
+        raise ValueError(f"instruments columns must be in {list(INSTRUMENT_DEFAULTS)}")
+
+    if not pd.Index(assets).isin(table.index).all():
+        raise ValueError("instruments must have a row for every asset")
+
+    table = table.reindex(index=assets)
+    arrays = {}
+    for key, default in INSTRUMENT_DEFAULTS.items():
+        values = np.full(len(table), default, dtype=np.float64)
+        if key in table:
+            values = table[key].to_numpy(dtype=np.float64)
+        arrays[key] = np.ascontiguousarray(values)
+
+    if not (arrays["lot_step"] > 0).all():
+        raise ValueError("instruments lot_step must be greater than 0")
+
+    return Instruments(**arrays)
+
 
 def distribute(weights: pd.Series, max: float) -> np.ndarray:
     """
@@ -45,6 +123,65 @@ def distribute_longshort(weights: pd.Series, max: float) -> pd.Series:
     return pd.Series(ls_weights)
 
 
+def cap_weights(weights: pd.DataFrame, max: float) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    Cap the absolute weight of every row of a weights frame at a maximum.
+    Excess is redistributed proportional to the uncapped weights of the row
+    so the absolute sum of each row is kept, and signs are preserved.
+    Rows are capped together by water-filling, which converges in at most
+    one pass per asset.
+    Rows with too few nonzero weights to hold the absolute sum at the max
+    fall back to distribute, which gives weight to the zero weight assets
+    of the row as longs, solving each such row with SLSQP.
+    Rows where even every asset at the max is short of the absolute sum
+    are not solved, their weights are capped at the max so the row sums
+    to less than the input.
+    Returns the capped weights and the status of each row:
+    "ok", "fallback" when solved by distribute, or "failed".
+    """
+    values = weights.to_numpy(dtype=np.float64)
+    x = np.abs(np.nan_to_num(values))
+    total = x.sum(axis=1, keepdims=True)
+
+    # Rows need a fallback when every nonzero weight at the max is short
+    # of the total, and are infeasible when every asset at the max is short
+    def fits(n: np.ndarray) -> np.ndarray:
+        room = n * max
+        return (room >= total[:, 0]) | np.isclose(room, total[:, 0])
+
+    listed = ~np.isnan(values)
+    nonzero_fits = fits(np.count_nonzero(x, axis=1))
+    listed_fits = fits(listed.sum(axis=1))
+
+    # Cap weights over the max and scale up the rest to fill the excess
+    capped = np.zeros(x.shape, dtype=bool)
+    for _ in range(x.shape[1]):
+        over = x > max
+        if not (over & ~capped).any():
+            break
+        capped |= over
+        free = np.where(capped, 0, x).sum(axis=1, keepdims=True)
+        excess = total - max * capped.sum(axis=1, keepdims=True)
+        scale = np.divide(excess, free, out=np.ones_like(free), where=free > 0)
+        x = np.where(capped, max, x * scale)
+
+    status = np.where(nonzero_fits, "ok", "failed").astype(object)
+    for i in np.flatnonzero(~nonzero_fits & listed_fits):
+        row = np.abs(values[i, listed[i]])
+        fallback = distribute(pd.Series(row), max)
+        if np.all(fallback <= max + 1e-6) and np.isclose(fallback.sum(), total[i]):
+            x[i, listed[i]] = fallback
+            status[i] = "fallback"
+
+    capped_weights = np.copysign(x, values)
+    capped_weights[np.isnan(values)] = np.nan
+
+    return (
+        pd.DataFrame(capped_weights, index=weights.index, columns=weights.columns),
+        pd.Series(status, index=weights.index, name="status"),
+    )
+
+
 def to_weights(x: pd.Series) -> pd.Series:
     """
     Transform a continous signed forecast into
@@ -55,6 +192,60 @@ def to_weights(x: pd.Series) -> pd.Series:
     return cast(pd.Series, np.copysign(weights, x))
 
 
+def to_weights_frame(
+    forecasts: pd.DataFrame,
+    max_weight: float | None = None,
+    prices: pd.DataFrame | None = None,
+    mask: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """
+    Transform a frame of continuous signed forecasts into a frame of weights
+    with an absolute sum of 1 for each row, ready to backtest.
+    Each stage is applied to the whole frame at once, in order:
+    masking of assets where the mask is False, scaling by the inverse
+    EWMA volatility of the price returns when prices are given,
+    normalizing, and capping at the max weight when given.
+    Missing forecasts and rows without a forecast are given zero weight,
+    so those rows sum to 0.
+    Rows with too few assets to be capped at the max weight are left capped
+    at the max, summing to less than 1, with a RuntimeWarning naming them,
+    see cap_weights for the status of each row.
+    """
+    x = forecasts.to_numpy(dtype=np.float64, copy=True)
+
+    if mask is not None:
+        keep = mask.reindex_like(forecasts).fillna(False).to_numpy(dtype=bool)
+        x[~keep] = 0
+
+    if prices is not None:
+        returns = prices.reindex_like(forecasts).pct_change()
+        var = (
+            (returns**2)
+            .ewm(alpha=const.EWMA_ALPHA, min_periods=const.EWMA_WARMUP)
+            .mean()
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x /= np.sqrt(var.to_numpy(dtype=np.float64))
+
+    x[~np.isfinite(x)] = 0
+    total = np.abs(x).sum(axis=1, keepdims=True)
+    np.divide(x, total, out=x, where=total > 0)
+
+    weights = pd.DataFrame(x, index=forecasts.index, columns=forecasts.columns)
+    if max_weight is not None:
+        weights, status = cap_weights(weights, max_weight)
+        failed = status == "failed"
+        if failed.any():
+            warnings.warn(
+                f"max_weight cannot be met by {failed.sum()} rows "
+                f"with too few assets, first at {failed.idxmax()}",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+
+    return weights
+
+
 def allocate(
     capital: float,
     price: pd.Series,
@@ -63,6 +254,7 @@ def allocate(
     trade_buffer: float = 0,
     lot_size: pd.Series | None = None,
     short_f: float = 1,
+    instruments: pd.DataFrame | None = None,
 ) -> tuple[pd.Series, ...]:
     """
     Allocate capital to a portfolio given a set of weights.
@@ -72,32 +264,32 @@ def allocate(
     allow partial buy/sell.
     Short factor can be given to trim short side target weights
     given the inherent margin requirements.
+    An instrument table, when given, sets the lot step, min notional and
+    precision of each asset in place of the lot size.
+    Inputs are aligned to the target weights and allocated by allocate_array.
     """
-
-    start_weights = marked_portfolio / capital
-
-    # Adjust for trade buffer
-    adj_target_weight = target_weights.copy()
-    adj_target_weight[:] = [
-        _buffer_target(x, y, trade_buffer)
-        for x, y in zip(target_weights, start_weights)
+    index = target_weights.index
+
+    def values(x: pd.Series) -> np.ndarray:
+        return x.reindex(index).to_numpy(dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rebal = allocate_array(
+            capital,
+            values(price),
+            values(marked_portfolio),
+            values(target_weights),
+            trade_buffer,
+            None if lot_size is None else values(lot_size),
+            short_f,
+            instruments=(
+                None if instruments is None else to_instruments(instruments, index)
+            ),
+        )
+    start_weights, adj_target_weight, adj_delta_weight, base_qty, quote_qty = [
+        pd.Series(x, index=index) for x in rebal
     ]
 
-    # Adjust for short side factor
-    adj_target_weight = adj_target_weight.apply(lambda x: x * short_f if x < 0 else x)
-
-    # Delta determines the amounts to rebalance
-    adj_delta_weight = adj_target_weight - start_weights
-
-    # Descretize weights using given capital and lot size
-    if lot_size is None:
-        lot_size = price.copy()
-
-    lots = _discretize(capital, adj_delta_weight, lot_size)
-
-    quote_qty = lots * lot_size
-    base_qty = quote_qty / price
-
     return (
         start_weights,
         target_weights,
@@ -108,21 +300,132 @@ def allocate(
     )
 
 
-def _buffer_target(target: float, current: float, buffer: float) -> float:
-    buffered = current
+def allocate_array(
+    capital: float | np.ndarray,
+    price: np.ndarray,
+    marked_portfolio: np.ndarray,
+    target_weights: np.ndarray,
+    trade_buffer: float | np.ndarray = 0,
+    lot_size: float | np.ndarray | None = None,
+    short_f: float | np.ndarray = 1,
+    out: tuple[np.ndarray, ...] | None = None,
+    instruments: Instruments | None = None,
+) -> tuple[np.ndarray, ...]:
+    """
+    Array version of allocate operating on ndarrays of any broadcastable shape,
+    such as (configs x assets) with capital, trade buffer and short factor
+    given per configuration as (configs x 1).
+    Instruments replace the lot size with a lot of the lot step at the price
+    rounded to the price precision, base quantities are rounded to the size
+    precision and orders below the min notional are dropped.
+    Returns the start weights, adjusted target weights, adjusted delta weights,
+    base quantities and quote quantities. These are written into the five
+    arrays of out when given so that repeated calls do not allocate.
+    """
+    if out is None:
+        shape = np.broadcast_shapes(
+            np.shape(capital),
+            np.shape(price),
+            np.shape(marked_portfolio),
+            np.shape(target_weights),
+            np.shape(trade_buffer),
+            np.shape(short_f),
+        )
+        out = tuple(np.empty(shape) for _ in range(5))
+    start_weights, adj_target_weight, adj_delta_weight, base_qty, quote_qty = out
+
+    np.divide(marked_portfolio, capital, out=start_weights)
+
+    # Adjust for trade buffer, using the quantity buffers as scratch space
+    _buffer_target(
+        target_weights,
+        start_weights,
+        trade_buffer,
+        out=adj_target_weight,
+        scratch=(base_qty, quote_qty),
+    )
 
-    if current < (target - buffer):
-        buffered = target - buffer
+    # Adjust for short side factor
+    np.multiply(
+        adj_target_weight, short_f, out=adj_target_weight, where=adj_target_weight < 0
+    )
 
-    if current > (target + buffer):
-        buffered = target + buffer
+    # Delta determines the amounts to rebalance
+    np.subtract(adj_target_weight, start_weights, out=adj_delta_weight)
 
-    return buffered
+    # Descretize weights using given capital and lot size
+    if instruments is not None:
+        price = _round(price, instruments.price_precision)
+        lot_size = instruments.lot_step * price
+    elif lot_size is None:
+        lot_size = price
+
+    lots = _discretize(
+        capital,
+        adj_delta_weight,
+        lot_size,
+        out=(quote_qty, base_qty),
+        min_notional=None if instruments is None else instruments.min_notional,
+    )
 
+    if instruments is not None:
+        np.multiply(lots, instruments.lot_step, out=base_qty)
+        base_qty[:] = _round(base_qty, instruments.size_precision)
+        np.multiply(base_qty, price, out=quote_qty)
+    else:
+        np.multiply(lots, lot_size, out=quote_qty)
+        np.divide(quote_qty, price, out=base_qty)
 
-def _discretize(capital: float, weights: pd.Series, lot_sizes: pd.Series) -> pd.Series:
-    budget = (weights * capital).round()
-    rem = budget % lot_sizes
-    lots = (budget - rem) / lot_sizes
+    return start_weights, adj_target_weight, adj_delta_weight, base_qty, quote_qty
 
-    return lots
+
+def _buffer_target(
+    target: float | np.ndarray,
+    current: float | np.ndarray,
+    buffer: float | np.ndarray,
+    out: np.ndarray | None = None,
+    scratch: tuple[np.ndarray, np.ndarray] | None = None,
+) -> float | np.ndarray:
+    """
+    Clip current weights to within the buffer either side of the target.
+    """
+    lower, upper = (None, None) if scratch is None else scratch
+    lower = np.subtract(target, buffer, out=lower)
+    upper = np.add(target, buffer, out=upper)
+    return np.clip(current, lower, upper, out=out)
+
+
+def _discretize(
+    capital: float | np.ndarray,
+    weights: pd.Series | np.ndarray,
+    lot_sizes: pd.Series | np.ndarray,
+    out: tuple[np.ndarray, np.ndarray] | None = None,
+    min_notional: np.ndarray | None = None,
+) -> pd.Series | np.ndarray:
+    # Lots of orders valued below the min notional are zeroed
+    if out is None:
+        budget = (weights * capital).round()
+        rem = budget % lot_sizes
+        budget = budget - rem
+        if min_notional is not None:
+            budget[np.abs(budget) < min_notional] = 0
+        return budget / lot_sizes
+
+    budget, rem = out
+    np.multiply(weights, capital, out=budget)
+    np.round(budget, out=budget)
+    np.remainder(budget, lot_sizes, out=rem)
+    np.subtract(budget, rem, out=budget)
+    if min_notional is not None:
+        budget[np.abs(budget) < min_notional] = 0
+    np.divide(budget, lot_sizes, out=budget)
+
+    return budget
+
+
+def _round(x: np.ndarray, decimals: np.ndarray) -> np.ndarray:
+    # Round to a number of decimals per asset, a NaN leaves values unrounded
+    scale = 10.0**decimals
+    with np.errstate(invalid="ignore"):
+        rounded = np.round(x * scale) / scale
+    return np.where(np.isnan(decimals), x, rounded)
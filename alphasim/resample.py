@@ -0,0 +1,172 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Sequence
+
+import numpy as np
+import pandas as pd
+
+import alphasim.const as const
+from alphasim.result import BacktestResult
+from alphasim.stats import backtest_returns
+
+METHODS = ["block", "stationary"]
+
+
+class Bootstrap(NamedTuple):
+    """
+    Stats of each resampled path with a row per path,
+    and the quantiles of each stat with a row per quantile.
+    """
+
+    stats: pd.DataFrame
+    quantiles: pd.DataFrame
+
+
+def bootstrap_stats(
+    result: pd.DataFrame | BacktestResult,
+    paths: int = 1000,
+    block_size: int = 20,
+    method: str = "block",
+    quantiles: Sequence[float] = (0.05, 0.5, 0.95),
+    seed: int | None = None,
+    max_workers: int = 1,
+    chunksize: int = 1000,
+    freq: int = 1,
+    freq_unit: str = "D",
+    trading_days_year: int = const.TRADING_DAYS_YEAR,
+) -> Bootstrap:
+    """
+    Distribution of the backtest stats over paths of the backtest returns
+    resampled with a moving block or stationary bootstrap.
+    Paths are generated and evaluated as 2-D arrays in chunks of paths,
+    each chunk seeded from the given seed so the output is deterministic
+    regardless of the number of workers.
+    Chunks are split across a pool of processes when max_workers is
+    greater than 1.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+
+    if paths < 1:
+        raise ValueError("paths must be greater than 0")
+
+    if chunksize < 1:
+        raise ValueError("chunksize must be greater than 0")
+
+    ret = backtest_returns(result)
+    index = ret.index
+    returns = ret.dropna().to_numpy(dtype=np.float64)
+
+    if len(returns) < 2:
+        raise ValueError("result must have at least 2 returns")
+
+    if not 1 <= block_size <= len(returns):
+        raise ValueError("block_size must be between 1 and the number of returns")
+
+    years = (index[-1] - index[0]).days / const.CALENDAR_DAYS_YEAR
+    ret_per_day = pd.Timedelta(1, unit="D") / pd.Timedelta(freq, unit=freq_unit)
+    ann_factor = ret_per_day * trading_days_year
+
+    sizes = [min(chunksize, paths - i) for i in range(0, paths, chunksize)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [
+        (returns, size, block_size, method, s, years, ann_factor)
+        for size, s in zip(sizes, seeds)
+    ]
+
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunks = list(executor.map(_run, *zip(*args)))
+    else:
+        chunks = [_run(*a) for a in args]
+
+    df = pd.concat(chunks, ignore_index=True)
+    return Bootstrap(df, df.quantile(list(quantiles)))
+
+
+def bootstrap_paths(
+    returns: np.ndarray,
+    paths: int,
+    block_size: int,
+    method: str = "block",
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """
+    Resample returns into a (paths x periods) array.
+    A moving block bootstrap joins blocks of a fixed size drawn at random,
+    a stationary bootstrap joins blocks of a random size with a geometric
+    distribution of mean block size, wrapping around the end of the returns.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    n = len(returns)
+    pos = np.arange(n)
+
+    if method == "block":
+        blocks = -(-n // block_size)
+        starts = rng.integers(0, n - block_size + 1, size=(paths, blocks))
+        idx = (starts[:, :, None] + np.arange(block_size)).reshape(paths, -1)[:, :n]
+    else:
+        # Position where the block covering each period begins
+        new_block = rng.random((paths, n)) < 1 / block_size
+        new_block[:, 0] = True
+        begin = np.maximum.accumulate(np.where(new_block, pos, 0), axis=1)
+        starts = rng.integers(0, n, size=(paths, n))
+        idx = (np.take_along_axis(starts, begin, axis=1) + pos - begin) % n
+
+    return returns[idx]
+
+
+def path_stats(returns: np.ndarray, years: float, ann_factor: float) -> pd.DataFrame:
+    """
+    Stats of each row of a (paths x periods) array of returns spanning
+    the given years, computed for all paths in one vectorized pass.
+    Definitions match summary_stats.
+    """
+    n = returns.shape[1]
+
+    growth = np.cumprod(1 + returns, axis=1)
+    nav = np.column_stack([np.ones(len(returns)), growth])
+    dd = nav / np.maximum.accumulate(nav, axis=1) - 1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = growth[:, -1] ** (1 / years) - 1
+
+        dev = returns - returns.mean(axis=1, keepdims=True)
+        m2 = (dev**2).sum(axis=1)
+        m3 = (dev**3).sum(axis=1)
+        m4 = (dev**4).sum(axis=1)
+
+        vol = np.sqrt(m2 / (n - 1)) * np.sqrt(ann_factor)
+        sr = cagr / vol
+
+        # Bias adjusted skew and excess kurtosis as computed by pandas
+        skew = n * np.sqrt(n - 1) / (n - 2) * m3 / m2**1.5
+        kurt = n * (n + 1) * (n - 1) * m4 / ((n - 2) * (n - 3) * m2**2)
+        kurt -= 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+
+    df = pd.DataFrame()
+    df["cagr"] = cagr
+    df["ann_volatility"] = vol
+    df["ann_sharpe"] = sr
+    df["kelly_f"] = cagr / (vol**2)
+    df["kelly_f_cagr"] = (sr**2) / 2
+    df["skew"] = np.where(m2 == 0, 0, skew) if n > 2 else np.nan
+    df["kurtosis"] = np.where(m2 == 0, 0, kurt) if n > 3 else np.nan
+    df["max_drawdown"] = dd.min(axis=1)
+
+    return df
+
+
+def _run(
+    returns: np.ndarray,
+    paths: int,
+    block_size: int,
+    method: str,
+    seed: np.random.SeedSequence,
+    years: float,
+    ann_factor: float,
+) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    resampled = bootstrap_paths(returns, paths, block_size, method, rng)
+    return path_stats(resampled, years, ann_factor)
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+
+from alphasim.const import CASH, EQUITY, RESULT_KEYS
+from alphasim.engine import Simulation
+
+
+class BacktestResult:
+    """
+    Columnar store of a backtest holding one (periods x assets) array
+    per result key and the cash position as separate vectors.
+    Totals per period are always held, the per asset fields (ledger)
+    can be None when a backtest only records the totals, or hold only
+    some of the result keys when loaded from a store.
+    Converts to the long format frame indexed by (period, asset) on request.
+    Opening cash is the cash balance before the first period, which is the
+    initial capital unless the result continues an earlier simulation.
+    Backtests across venues also hold the cash balance and the equity
+    including cash of each venue as (periods x venues) arrays.
+    """
+
+    def __init__(
+        self,
+        index: pd.Index,
+        assets: pd.Index,
+        fields: dict[str, np.ndarray] | None,
+        totals: dict[str, np.ndarray],
+        cash: np.ndarray,
+        capital: np.ndarray,
+        initial_capital: float,
+        periods: int,
+        opening_cash: float | None = None,
+        venues: pd.Index | None = None,
+        venue_cash: np.ndarray | None = None,
+        venue_equity: np.ndarray | None = None,
+    ):
+        self.index = index
+        self.assets = assets
+        self.fields = fields
+        self.totals = totals
+        self.cash = cash
+        self.capital = capital
+        self.initial_capital = initial_capital
+        self.periods = periods
+        self.opening_cash = initial_capital if opening_cash is None else opening_cash
+        self.venues = venues
+        self.venue_cash = venue_cash
+        self.venue_equity = venue_equity
+        self._frame: pd.DataFrame | None = None
+
+    @classmethod
+    def from_simulation(
+        cls,
+        index: pd.Index,
+        assets: pd.Index,
+        sim: Simulation,
+        k: int,
+        initial_capital: float,
+        opening_cash: float | None = None,
+        venues: pd.Index | None = None,
+    ) -> "BacktestResult":
+        """
+        Result of the configuration at position k of a simulation,
+        with the venues of its venue ledgers if any.
+        """
+        fields = None
+        if sim.fields is not None:
+            fields = {key: values[k] for key, values in sim.fields.items()}
+
+        venue_cash = venue_equity = None
+        if sim.venue_cash is not None and sim.venue_equity is not None:
+            venue_cash, venue_equity = sim.venue_cash[k], sim.venue_equity[k]
+
+        return cls(
+            index,
+            assets,
+            fields,
+            {key: values[k] for key, values in sim.totals.items()},
+            sim.cash[k],
+            sim.capital[k],
+            initial_capital,
+            int(sim.periods[k]),
+            opening_cash=opening_cash,
+            venues=venues,
+            venue_cash=venue_cash,
+            venue_equity=venue_equity,
+        )
+
+    def __len__(self) -> int:
+        return len(self.index) * (len(self.assets) + 1)
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        """
+        Wide frame of a result key with a column per asset.
+        """
+        return pd.DataFrame(self.ledger[key], index=self.index, columns=self.assets)
+
+    @property
+    def ledger(self) -> dict[str, np.ndarray]:
+        if self.fields is None:
+            raise ValueError("result does not hold the per asset ledger")
+        return self.fields
+
+    @property
+    def start_cash(self) -> np.ndarray:
+        start_cash = np.zeros(len(self.index))
+        if self.periods > 0:
+            start_cash[0] = self.opening_cash
+            start_cash[1 : self.periods] = self.cash[: self.periods - 1]
+        return start_cash
+
+    def keys(self) -> list[str]:
+        """
+        Result keys held by the ledger in the order of RESULT_KEYS.
+        """
+        return [key for key in RESULT_KEYS if key in self.ledger]
+
+    def cash_values(self, key: str) -> np.ndarray:
+        """
+        Values of a result key for the cash position.
+        Keys that do not apply to cash are NaN for the periods simulated.
+        """
+        values = np.full(len(self.index), np.nan)
+        match key:
+            case "price":
+                values[:] = 1
+            case "start_portfolio" | "equity":
+                values = self.start_cash
+            case "start_weight":
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    values = self.start_cash / self.capital
+            case "end_portfolio":
+                values = self.cash.copy()
+            case "is_trade":
+                values = np.zeros(len(self.index), dtype=bool)
+
+        values[self.periods :] = 0
+        return values
+
+    def total_equity(self) -> pd.Series:
+        """
+        Marked-to-market equity of the portfolio including cash for each period.
+        """
+        return pd.Series(self.totals[EQUITY], index=self.index, name=EQUITY)
+
+    def venue_totals(self) -> pd.DataFrame:
+        """
+        Cash balance and marked-to-market equity including cash of each venue
+        per period, with columns of (key, venue) for the cash and equity keys.
+        """
+        if self.venue_cash is None or self.venue_equity is None:
+            raise ValueError("result does not hold the venue ledgers")
+
+        return pd.concat(
+            {
+                CASH: pd.DataFrame(self.venue_cash, self.index, self.venues),
+                EQUITY: pd.DataFrame(self.venue_equity, self.index, self.venues),
+            },
+            axis=1,
+        )
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Totals of each result key per period, equivalent to
+        grouping the long format frame by period and summing.
+        """
+        data = {}
+        for key in self.keys():
+            totals = self.ledger[key].sum(axis=1)
+            data[key] = totals + np.nan_to_num(self.cash_values(key))
+        return pd.DataFrame(data, index=self.index)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Long format frame indexed by (period, asset) with the cash
+        position appended as the last asset of each period.
+        The frame is built once and cached.
+        """
+        if self._frame is not None:
+            return self._frame
+
+        asset_list = self.assets.tolist()
+        asset_list.append(CASH)
+        midx = pd.MultiIndex.from_product([self.index, asset_list])
+
+        data = {
+            key: np.column_stack([self.ledger[key], self.cash_values(key)]).ravel()
+            for key in self.keys()
+        }
+
+        self._frame = pd.DataFrame(data, index=midx)
+        return self._frame
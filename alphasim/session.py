@@ -0,0 +1,209 @@
+from typing import Any, Callable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from alphasim.commission import zero_commission
+from alphasim.engine import Engine, simulate
+from alphasim.money import initial_capital
+from alphasim.result import BacktestResult
+from alphasim.stats import StreamingStats
+from alphasim.util import prepare_inputs
+
+OUTPUTS = ["frame", "result", "summary"]
+
+
+class BacktestSession:
+    """
+    Stateful backtest advanced one period at a time for live
+    and append-only data.
+    The session carries the cash balance and portfolio between periods,
+    so each new period costs the same regardless of the history behind it.
+    A checkpoint of the state can be taken to resume the session later
+    without recomputing the periods already stepped.
+    Stats of the periods stepped are kept up to date when given
+    a StreamingStats accumulator.
+    """
+
+    def __init__(
+        self,
+        assets: Sequence[str] | pd.Index,
+        funding_on_abs_position: bool = False,
+        trade_buffer: float = 0,
+        commission_func: Callable[[float, float], float] = zero_commission,
+        initial_capital: float = 1000,
+        money_func: Callable[[float, float], float] = initial_capital,
+        discrete_shares: bool = False,
+        short_f: float = 1,
+        spread_f: float = 0,
+        stats: StreamingStats | None = None,
+    ):
+        if len(assets) == 0:
+            raise ValueError("assets length must be greater than 0")
+
+        self.assets = pd.Index(assets)
+        self.initial_capital = initial_capital
+        self.stats = stats
+        self._engine = Engine(
+            len(self.assets),
+            funding_on_abs_position,
+            [trade_buffer],
+            [commission_func],
+            [initial_capital],
+            [money_func],
+            discrete_shares,
+            [short_f],
+            [spread_f],
+        )
+
+    @classmethod
+    def from_checkpoint(
+        cls, checkpoint: dict[str, Any], **kwargs: Any
+    ) -> "BacktestSession":
+        """
+        Resume a session from a checkpoint.
+        Keyword args are the session args other than the assets and
+        initial capital, which are restored from the checkpoint.
+        """
+        session = cls(
+            checkpoint["assets"],
+            initial_capital=checkpoint["initial_capital"],
+            **kwargs,
+        )
+
+        engine = session._engine
+        engine.cash[:] = checkpoint["cash"]
+        engine.port[0] = checkpoint["port"].reindex(session.assets)
+        engine.periods[:] = checkpoint["periods"]
+        engine.period = checkpoint["periods"]
+        engine.alive[:] = not checkpoint["rekt"]
+
+        return session
+
+    @property
+    def cash(self) -> float:
+        return float(self._engine.cash[0])
+
+    @property
+    def port(self) -> pd.Series:
+        return pd.Series(self._engine.port[0], index=self.assets)
+
+    @property
+    def periods(self) -> int:
+        return int(self._engine.periods[0])
+
+    @property
+    def rekt(self) -> bool:
+        return not self._engine.alive[0]
+
+    def checkpoint(self) -> dict[str, Any]:
+        """
+        State of the session, which can be persisted with pickle.
+        """
+        return {
+            "assets": self.assets.tolist(),
+            "initial_capital": self.initial_capital,
+            "cash": self.cash,
+            "port": self.port,
+            "periods": self.periods,
+            "rekt": self.rekt,
+        }
+
+    def step(
+        self,
+        price_row: pd.Series,
+        weight_row: pd.Series,
+        funding_row: pd.Series | None = None,
+    ) -> pd.DataFrame | None:
+        """
+        Advance the session one period and return the records of the period
+        in the long format of a backtest result.
+        The period is labelled with the name of the weight row, such as
+        a row taken from a frame of weights, else by the count of periods.
+        Returns None if the portfolio is rekt.
+        """
+        if price_row.isna().any() or weight_row.isna().any():
+            raise ValueError("prices and weights must not have any NaNs")
+
+        label = weight_row.name
+        if label is None:
+            label = self.periods
+
+        funding = np.zeros(len(self.assets))
+        if funding_row is not None:
+            funding = self._row(funding_row)
+
+        opening_cash = self.cash
+        step = self._engine.step(self._row(price_row), funding, self._row(weight_row))
+        if step is None:
+            return None
+
+        if self.stats is not None:
+            self.stats.update(label, step.totals)
+
+        result = BacktestResult(
+            pd.Index([label]),
+            self.assets,
+            {key: np.array(values, ndmin=2) for key, values in step.fields.items()},
+            {key: np.array(values) for key, values in step.totals.items()},
+            np.array(step.cash),
+            np.array(step.capital),
+            self.initial_capital,
+            1,
+            opening_cash=opening_cash,
+        )
+
+        return result.to_frame()
+
+    def run(
+        self,
+        prices: pd.DataFrame,
+        weights: pd.DataFrame,
+        funding_rates: pd.DataFrame | None = None,
+        output: str = "frame",
+    ) -> pd.DataFrame | BacktestResult:
+        """
+        Step the session through frames of new periods.
+        Summary output skips recording the per asset ledger.
+        """
+        if output not in OUTPUTS:
+            raise ValueError(f"output must be one of {OUTPUTS}")
+
+        if set(weights.columns) != set(self.assets):
+            raise ValueError("columns of weights must match session assets")
+
+        if not weights.columns.equals(self.assets):
+            weights = weights[self.assets]
+        inputs = prepare_inputs(prices, weights, funding_rates)
+
+        opening_cash = self.cash
+        sim = simulate(
+            inputs.prices,
+            inputs.weights,
+            inputs.funding_rates,
+            self._engine,
+            ledger=output != "summary",
+        )
+        result = BacktestResult.from_simulation(
+            inputs.index,
+            self.assets,
+            sim,
+            0,
+            self.initial_capital,
+            opening_cash=opening_cash,
+        )
+
+        if self.stats is not None:
+            for i in range(result.periods):
+                totals = {key: values[i] for key, values in result.totals.items()}
+                self.stats.update(result.index[i], totals)
+
+        if output != "frame":
+            return result
+
+        return result.to_frame()
+
+    def _row(self, row: pd.Series) -> np.ndarray:
+        if set(row.index) != set(self.assets):
+            raise ValueError("row index must match session assets")
+        return row[self.assets].to_numpy(dtype=np.float64)
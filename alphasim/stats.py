@@ -1,38 +1,134 @@
+from typing import Hashable, Mapping, Sequence
+
 import numpy as np
 import pandas as pd
+from numpy.typing import ArrayLike
 
-import alphasim.backtest as bt
 import alphasim.const as const
+from alphasim.result import BacktestResult
+
+# Rolling windows are computed in chunks of up to this many values
+ROLLING_CHUNK_CELLS = 2**20
 
 
 def backtest_stats(
-    result: pd.DataFrame,
+    result: pd.DataFrame | BacktestResult,
     benchmark: pd.DataFrame | None = None,
     freq: int = 1,
     freq_unit: str = "D",
     trading_days_year: int = const.TRADING_DAYS_YEAR,
 ) -> pd.DataFrame | None:
-
+    """
+    Stats of a backtest result, alongside the stats of buying and holding
+    each column of the benchmark prices when given.
+    Stats of all benchmark columns are computed in one pass, with a column
+    per benchmark named as in the benchmark frame, or "benchmark" when
+    there is a single column.
+    """
     if result is None or len(result) == 0:
         raise ValueError("result must not be None or empty")
 
-    summary = result.groupby(level=0).sum()
-    start = summary.index[0]
-    end = summary.index[-1]
-    days = (end - start).days
+    totals = {key: x.to_frame("result") for key, x in _totals(result).items()}
+    df = summary_stats(
+        totals, freq=freq, freq_unit=freq_unit, trading_days_year=trading_days_year
+    ).T
+
+    if benchmark is not None:
+        benchmark_stats = _asset_stats(
+            benchmark,
+            initial=df.loc["result", "initial"],
+            freq=freq,
+            freq_unit=freq_unit,
+            trading_days_year=trading_days_year,
+        )
+
+        # A single benchmark is labelled as such, many by their column names
+        if len(benchmark.columns) == 1:
+            benchmark_stats.index = ["benchmark"]
+        df.index = ["backtest"]
+        df = pd.concat([benchmark_stats, df], join="outer")
+
+    return df.T
+
+
+def summary_stats(
+    totals: dict[str, pd.DataFrame],
+    freq: int = 1,
+    freq_unit: str = "D",
+    trading_days_year: int = const.TRADING_DAYS_YEAR,
+) -> pd.DataFrame:
+    """
+    Stats for one or more backtests given their totals per period.
+    Totals map each of the TOTAL_KEYS to a frame with a column per backtest.
+    Stats for all backtests are computed in one pass over the columns.
+    """
+    equity = totals[const.EQUITY]
+    ret = equity.pct_change()
+
+    # Max drawdown
+    cum_ret = (1 + ret).cumprod() - 1
+    nav = ((1 + cum_ret) * 100).fillna(100)
+    hwm = nav.cummax()
+    dd = nav / hwm - 1
 
+    df = _stats_frame(
+        equity.columns,
+        start=equity.index[0],
+        end=equity.index[-1],
+        initial=equity.iloc[0],
+        final=equity.iloc[-1],
+        ret_std=ret.std(),
+        ret_skew=ret.skew(),
+        ret_kurtosis=ret.kurtosis(),
+        max_drawdown=dd.min(),
+        mean_equity=equity.mean(),
+        commission=totals["commission"].sum(),
+        funding_payment=totals["funding_payment"].sum(),
+        buy_value=totals["buy_value"].sum(),
+        sell_value=totals["sell_value"].sum(),
+        trade_count=totals["trade_count"].sum(),
+        freq=freq,
+        freq_unit=freq_unit,
+        trading_days_year=trading_days_year,
+    )
+
+    return df.T
+
+
+def _stats_frame(
+    columns: pd.Index,
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    initial: ArrayLike,
+    final: ArrayLike,
+    ret_std: ArrayLike,
+    ret_skew: ArrayLike,
+    ret_kurtosis: ArrayLike,
+    max_drawdown: ArrayLike,
+    mean_equity: ArrayLike,
+    commission: ArrayLike,
+    funding_payment: ArrayLike,
+    buy_value: ArrayLike,
+    sell_value: ArrayLike,
+    trade_count: ArrayLike,
+    freq: int,
+    freq_unit: str,
+    trading_days_year: int,
+) -> pd.DataFrame:
+    """
+    Frame of stats with a row per backtest given the aggregates of
+    the equity, returns and transactions of each backtest.
+    """
+    days = (end - start).days
     cal_years = days / const.CALENDAR_DAYS_YEAR
 
-    ret = backtest_returns(result)
     ret_per_day = pd.Timedelta(1, unit="D") / pd.Timedelta(freq, unit=freq_unit)
 
-    initial = summary[bt.EQUITY].iloc[0]
-    final = summary[bt.EQUITY].iloc[-1]
     cagr = (final / initial) ** (1 / cal_years) - 1
-    vol = ret.std() * np.sqrt(ret_per_day * trading_days_year)
+    vol = ret_std * np.sqrt(ret_per_day * trading_days_year)
     sr = cagr / vol
 
-    df = pd.DataFrame(index=["result"])
+    df = pd.DataFrame(index=columns)
     df["start"] = start
     df["end"] = end
     df["trading_days_year"] = trading_days_year
@@ -46,52 +142,293 @@ def backtest_stats(
     df["ann_sharpe"] = sr
     df["kelly_f"] = cagr / (vol**2)
     df["kelly_f_cagr"] = (sr**2) / 2
-    df["commission"] = summary["commission"].sum()
-    df["funding_payment"] = summary["funding_payment"].sum()
+    df["commission"] = commission
+    df["funding_payment"] = funding_payment
     df["cost_profit_pct"] = (df["commission"] + df["funding_payment"]) / df["profit"]
-    df["trade_count"] = result["is_trade"].sum()
-    df["skew"] = ret.skew()
-    df["kurtosis"] = ret.kurtosis()
-
-    # Max drawdown
-    cum_ret = (1 + ret).cumprod() - 1
-    nav = ((1 + cum_ret) * 100).fillna(100)
-    hwm = nav.cummax()
-    dd = nav / hwm - 1
-    df["max_drawdown"] = dd.min()
+    df["trade_count"] = np.asarray(trade_count).astype(np.int64)
+    df["skew"] = ret_skew
+    df["kurtosis"] = ret_kurtosis
+    df["max_drawdown"] = max_drawdown
 
     # Turnover
-    mean_equity = summary[bt.EQUITY].mean()
-    buy_value = result["quote_qty"].loc[result["base_qty"] > 0].abs().sum()
-    sell_value = result["quote_qty"].loc[result["base_qty"] < 0].abs().sum()
-    tx_value = np.min([buy_value, sell_value])
+    tx_value = np.minimum(buy_value, sell_value)
     turnover = tx_value / mean_equity
     df["ann_turnover"] = turnover / cal_years
 
-    if benchmark is not None:
-        benchmark_stats = _asset_stats(
-            benchmark,
-            initial=initial,
-            freq=freq,
-            freq_unit=freq_unit,
-            trading_days_year=trading_days_year,
+    return df
+
+
+class StreamingStats:
+    """
+    Online accumulator of the backtest stats updated once per period
+    with the totals of the period, so the stats are available mid-run
+    without a second pass over the result.
+    Moments of the returns are tracked with Welford style updates,
+    alongside the high-water mark, max drawdown, turnover and costs.
+    One or more backtests are tracked together with a column per backtest.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[Hashable] = ("result",),
+        freq: int = 1,
+        freq_unit: str = "D",
+        trading_days_year: int = const.TRADING_DAYS_YEAR,
+    ):
+        k = len(columns)
+        self.columns = pd.Index(columns)
+        self.freq = freq
+        self.freq_unit = freq_unit
+        self.trading_days_year = trading_days_year
+
+        self.periods = 0
+        self.start: pd.Timestamp | None = None
+        self.end: pd.Timestamp | None = None
+        self.initial = np.zeros(k)
+        self.final = np.zeros(k)
+
+        # Moments of the returns
+        self.count = np.zeros(k)
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.m3 = np.zeros(k)
+        self.m4 = np.zeros(k)
+
+        # Drawdown of the NAV rebased to 100
+        self.nav = np.full(k, 100.0)
+        self.hwm = np.full(k, 100.0)
+        self.max_drawdown = np.zeros(k)
+
+        self.equity_sum = np.zeros(k)
+        self.sums = {key: np.zeros(k) for key in const.TOTAL_KEYS[1:]}
+
+    def update(self, period: Hashable, totals: Mapping[str, ArrayLike]) -> None:
+        """
+        Add a period given the total of each of the TOTAL_KEYS,
+        as a scalar or an array with a value per backtest.
+        """
+        equity = np.asarray(totals[const.EQUITY], dtype=np.float64)
+
+        if self.periods == 0:
+            self.start = period
+            self.initial = np.broadcast_to(equity, self.initial.shape).copy()
+        else:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self._add_return(equity / self.final - 1)
+
+        self.end = period
+        self.final = np.broadcast_to(equity, self.final.shape).copy()
+        self.periods += 1
+
+        self.equity_sum += equity
+        for key, values in self.sums.items():
+            values += totals[key]
+
+    def _add_return(self, ret: np.ndarray) -> None:
+        valid = ~np.isnan(ret)
+        x = np.where(valid, ret, 0)
+
+        # Higher order moments updated as in Pebay (2008)
+        n1 = self.count
+        n = n1 + valid
+        delta = x - self.mean
+        delta_n = np.divide(delta, n, out=np.zeros_like(delta), where=valid)
+        delta_n2 = delta_n * delta_n
+        term1 = delta * delta_n * n1
+
+        self.mean = self.mean + delta_n
+        self.m4 = (
+            self.m4
+            + term1 * delta_n2 * (n * n - 3 * n + 3)
+            + 6 * delta_n2 * self.m2
+            - 4 * delta_n * self.m3
         )
-        df = pd.concat(
-            [benchmark_stats, df], join="outer", keys=["benchmark", "backtest"]
-        ).droplevel(1)
+        self.m3 = self.m3 + term1 * delta_n * (n - 2) - 3 * delta_n * self.m2
+        self.m2 = self.m2 + term1
+        self.count = n
 
-    return df.T
+        # NaN returns are filled with the base NAV as in summary_stats
+        self.nav = np.where(valid, self.nav * (1 + x), self.nav)
+        nav = np.where(valid, self.nav, 100)
+        self.hwm = np.maximum(self.hwm, nav)
+        self.max_drawdown = np.minimum(self.max_drawdown, nav / self.hwm - 1)
+
+    def stats(self) -> pd.DataFrame:
+        """
+        Stats of the periods added so far, as returned by summary_stats.
+        """
+        if self.periods == 0:
+            raise ValueError("stats must have at least one period")
+
+        n = self.count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = self.m2 / (n - 1)
+            std = np.where(n > 1, np.sqrt(var), np.nan)
+
+            # Bias adjusted skew and excess kurtosis as computed by pandas
+            skew = n * np.sqrt(n - 1) / (n - 2) * self.m3 / self.m2**1.5
+            skew = np.where(n > 2, np.where(self.m2 == 0, 0, skew), np.nan)
+
+            adj = 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+            kurt = n * (n + 1) * (n - 1) * self.m4
+            kurt = kurt / ((n - 2) * (n - 3) * self.m2**2) - adj
+            kurt = np.where(n > 3, np.where(self.m2 == 0, 0, kurt), np.nan)
+
+            df = _stats_frame(
+                self.columns,
+                start=self.start,
+                end=self.end,
+                initial=self.initial,
+                final=self.final,
+                ret_std=std,
+                ret_skew=skew,
+                ret_kurtosis=kurt,
+                max_drawdown=self.max_drawdown,
+                mean_equity=self.equity_sum / self.periods,
+                commission=self.sums["commission"],
+                funding_payment=self.sums["funding_payment"],
+                buy_value=self.sums["buy_value"],
+                sell_value=self.sums["sell_value"],
+                trade_count=self.sums["trade_count"],
+                freq=self.freq,
+                freq_unit=self.freq_unit,
+                trading_days_year=self.trading_days_year,
+            )
+
+        return df.T
+
+
+def rolling_stats(
+    result: pd.DataFrame | BacktestResult,
+    window: int | None = None,
+    step: int = 1,
+    freq: int = 1,
+    freq_unit: str = "D",
+    trading_days_year: int = const.TRADING_DAYS_YEAR,
+) -> pd.DataFrame:
+    """
+    Stats over a window of periods ending at each period, computed for
+    all windows in one vectorized pass over the returns.
+    Windows are a fixed number of periods, or expand from the first period
+    when the window is None.
+    A step greater than 1 keeps every step-th window, such as for
+    walk-forward evaluation over non-overlapping windows.
+    """
+    if window is not None and window < 2:
+        raise ValueError("window must be greater than 1")
+
+    if step < 1:
+        raise ValueError("step must be greater than 0")
+
+    totals = _totals(result)
+    equity = totals[const.EQUITY]
+    ret = equity.pct_change()
+    dates = equity.index.to_series()
+
+    if window is None:
+        start_equity = equity.iloc[0]
+        start = dates.iloc[0]
+        ret_window = ret.expanding()
+        sum_buy = totals["buy_value"].cumsum()
+        sum_sell = totals["sell_value"].cumsum()
+        mean_equity = equity.expanding().mean()
+        dd = equity / equity.cummax() - 1
+        max_drawdown = dd.cummin()
+    else:
+        start_equity = equity.shift(window - 1)
+        start = dates.shift(window - 1)
+        ret_window = ret.rolling(window - 1)
+        sum_buy = totals["buy_value"].rolling(window).sum()
+        sum_sell = totals["sell_value"].rolling(window).sum()
+        mean_equity = equity.rolling(window).mean()
+
+        max_drawdown = pd.Series(
+            _rolling_max_drawdown(equity.to_numpy(dtype=np.float64), window, step),
+            index=equity.index,
+        )
+
+    cal_years = (dates - start).dt.days / const.CALENDAR_DAYS_YEAR
+    ret_per_day = pd.Timedelta(1, unit="D") / pd.Timedelta(freq, unit=freq_unit)
+
+    cagr = (equity / start_equity) ** (1 / cal_years) - 1
+    vol = ret_window.std() * np.sqrt(ret_per_day * trading_days_year)
+
+    df = pd.DataFrame(index=equity.index)
+    df["cagr"] = cagr
+    df["ann_volatility"] = vol
+    df["ann_sharpe"] = cagr / vol
+    df["skew"] = ret_window.skew()
+    df["kurtosis"] = ret_window.kurt()
+    df["max_drawdown"] = max_drawdown
+    df["ann_turnover"] = np.minimum(sum_buy, sum_sell) / mean_equity / cal_years
+
+    first = 0 if window is None else window - 1
+    return df.iloc[first::step]
 
 
-def backtest_returns(result: pd.DataFrame) -> pd.DataFrame:
-    return result[bt.EQUITY].astype(np.float64).groupby(level=0).sum().pct_change()
+def _rolling_max_drawdown(equity: np.ndarray, window: int, step: int) -> np.ndarray:
+    """
+    Drawdown from the high-water mark within each window of periods
+    kept by the step, NaN for other periods.
+    Windows are computed in chunks of up to ROLLING_CHUNK_CELLS values
+    so memory does not grow with the number of windows.
+    """
+    out = np.full(len(equity), np.nan)
+    if len(equity) < window:
+        return out
 
+    views = np.lib.stride_tricks.sliding_window_view(equity, window)[::step]
+    ends = np.arange(window - 1, len(equity), step)
+    rows = max(ROLLING_CHUNK_CELLS // window, 1)
+    for i in range(0, len(views), rows):
+        chunk = views[i : i + rows]
+        hwm = np.maximum.accumulate(chunk, axis=1)
+        out[ends[i : i + rows]] = (chunk / hwm - 1).min(axis=1)
 
-def backtest_log_returns(result: pd.DataFrame) -> pd.DataFrame:
-    equity = result[bt.EQUITY].astype(np.float64).groupby(level=0).sum()
+    return out
+
+
+def backtest_returns(result: pd.DataFrame | BacktestResult) -> pd.DataFrame:
+    return _total_equity(result).pct_change()
+
+
+def backtest_log_returns(result: pd.DataFrame | BacktestResult) -> pd.DataFrame:
+    equity = _total_equity(result)
     return (equity / equity.shift(1)).apply(np.log)
 
 
+def _total_equity(result: pd.DataFrame | BacktestResult) -> pd.Series:
+    if isinstance(result, BacktestResult):
+        return result.total_equity()
+    return result[const.EQUITY].astype(np.float64).groupby(level=0).sum()
+
+
+def _totals(result: pd.DataFrame | BacktestResult) -> dict[str, pd.Series]:
+    """
+    Totals per period for each of the TOTAL_KEYS.
+    """
+    if isinstance(result, BacktestResult):
+        return {
+            key: pd.Series(values, index=result.index)
+            for key, values in result.totals.items()
+        }
+
+    abs_quote_qty = result["quote_qty"].astype(np.float64).abs()
+    base_qty = result["base_qty"].astype(np.float64)
+
+    def period_sum(x: pd.Series) -> pd.Series:
+        return x.astype(np.float64).groupby(level=0).sum()
+
+    return {
+        const.EQUITY: _total_equity(result),
+        "commission": period_sum(result["commission"]),
+        "funding_payment": period_sum(result["funding_payment"]),
+        "buy_value": period_sum(abs_quote_qty.where(base_qty > 0, 0)),
+        "sell_value": period_sum(abs_quote_qty.where(base_qty < 0, 0)),
+        "trade_count": period_sum(result["is_trade"]),
+    }
+
+
 def _asset_stats(
     prices: pd.DataFrame,
     initial: float = 1000,
@@ -99,7 +436,10 @@ def _asset_stats(
     freq_unit: str = "D",
     trading_days_year: int = const.TRADING_DAYS_YEAR,
 ) -> pd.DataFrame:
-
+    """
+    Stats of buying and holding each asset with a row per asset,
+    computed for all assets in one pass over the columns.
+    """
     start = prices.index[0]
     end = prices.index[-1]
     days = (end - start).days
@@ -109,16 +449,16 @@ def _asset_stats(
     ret = prices.pct_change()
     ret_per_day = pd.Timedelta(1, unit="D") / pd.Timedelta(freq, unit=freq_unit)
 
-    port_units = initial / prices.iloc[0].squeeze()
+    port_units = initial / prices.iloc[0]
 
-    df = pd.DataFrame(index=[prices.columns[0]])
+    df = pd.DataFrame(index=prices.columns)
     df["start"] = start
     df["end"] = end
     df["trading_days_year"] = trading_days_year
     df["price_freq"] = f"{freq}{freq_unit}"
     df["risk_free_rate"] = const.RISK_FREE_RATE
     df["initial"] = initial
-    df["final"] = prices.iloc[-1].squeeze() * port_units
+    df["final"] = prices.iloc[-1] * port_units
     df["profit"] = df["final"] - df["initial"]
     df["cagr"] = (df["final"] / df["initial"]) ** (1 / cal_years) - 1
     df["ann_volatility"] = ret.std() * np.sqrt(ret_per_day * trading_days_year)
@@ -0,0 +1,282 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+from alphasim.const import RESULT_KEYS, TOTAL_KEYS
+from alphasim.result import BacktestResult
+
+META_FILE = "meta.json"
+
+DTYPES = ["float64", "float32"]
+
+# Version of the store layout, bumped when the files change
+FORMAT = 1
+
+
+class ResultSink:
+    """
+    Append-only on-disk columnar store of a backtest result.
+    Each result key, total, the cash and capital vectors and the period index
+    are written to their own raw binary file as periods arrive, so a result
+    can be recorded chunk by chunk without holding it in memory.
+    Float fields are stored as float64 or float32, given for all fields
+    or per result key, and is_trade as a bitmap of the assets of each period.
+    Totals, cash and capital are always float64.
+    Venue cash and equity of a result across venues are stored as float64
+    with a column per venue.
+    Datetime indexes with a timezone are stored as int64 nanoseconds
+    since the epoch in UTC with the timezone in the metadata.
+    The metadata describing the files, along with any run metadata given,
+    is written on close.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        assets: pd.Index,
+        dtype: str | Mapping[str, str] = "float64",
+        metadata: Mapping[str, Any] | None = None,
+    ):
+        if isinstance(dtype, str):
+            dtype = {key: dtype for key in RESULT_KEYS if key != "is_trade"}
+        for key, value in dtype.items():
+            if key not in RESULT_KEYS or key == "is_trade":
+                raise ValueError(f"dtype keys must be float result keys, not {key}")
+            if value not in DTYPES:
+                raise ValueError(f"dtype must be one of {DTYPES}")
+
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.assets = assets
+        self.dtypes = {key: "float64" for key in RESULT_KEYS if key != "is_trade"}
+        self.dtypes.update(dtype)
+        self.metadata = dict(metadata or {})
+        self.periods = 0
+        self.simulated = 0
+        self.initial_capital: float | None = None
+        self.opening_cash: float | None = None
+        self.index_dtype: str | None = None
+        self.index_tz: str | None = None
+        self.venues: pd.Index | None = None
+
+        # Truncate any earlier result at the same path, its metadata
+        # no longer describes the files until written on close
+        (self.path / META_FILE).unlink(missing_ok=True)
+        for name in self._files():
+            open(self.path / name, "wb").close()
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def append(self, result: BacktestResult) -> None:
+        """
+        Append the periods of a result, which must continue the periods
+        already written.
+        """
+        if result.fields is None:
+            raise ValueError("result must hold the per asset ledger")
+
+        if not result.assets.equals(self.assets):
+            raise ValueError("assets of result must match sink")
+
+        tz = None
+        if isinstance(result.index, pd.DatetimeIndex) and result.index.tz is not None:
+            tz = str(result.index.tz)
+            index = result.index.asi8
+        else:
+            index = result.index.to_numpy()
+        if index.dtype == object:
+            raise ValueError("index must be numeric or datetime")
+
+        if self.periods == 0:
+            self.initial_capital = result.initial_capital
+            self.opening_cash = result.opening_cash
+            self.index_dtype = index.dtype.str
+            self.index_tz = tz
+            self.venues = result.venues
+        elif index.dtype.str != self.index_dtype or tz != self.index_tz:
+            raise ValueError("index of result must match sink")
+
+        venues = result.venues
+        if (venues is None) != (self.venues is None) or (
+            venues is not None and not venues.equals(self.venues)
+        ):
+            raise ValueError("venues of result must match sink")
+
+        # Periods after the portfolio is rekt are not simulated
+        if self.simulated == self.periods:
+            self.simulated += result.periods
+
+        self._write("index", index)
+        for key, dtype in self.dtypes.items():
+            self._write(key, result.fields[key].astype(dtype, copy=False))
+        self._write("is_trade", np.packbits(result.fields["is_trade"], axis=1))
+        for key in TOTAL_KEYS:
+            self._write(f"total_{key}", result.totals[key].astype(np.float64))
+        self._write("cash", result.cash)
+        self._write("capital", result.capital)
+        if result.venue_cash is not None and result.venue_equity is not None:
+            self._write("venue_cash", result.venue_cash.astype(np.float64))
+            self._write("venue_equity", result.venue_equity.astype(np.float64))
+
+        self.periods += len(result.index)
+
+    def close(self) -> None:
+        meta = {
+            "format": FORMAT,
+            "assets": [str(x) for x in self.assets],
+            "assets_dtype": str(self.assets.dtype),
+            "periods": self.periods,
+            "simulated": self.simulated,
+            "initial_capital": self.initial_capital,
+            "opening_cash": self.opening_cash,
+            "index_dtype": self.index_dtype,
+            "index_tz": self.index_tz,
+            "venues": None,
+            "dtypes": self.dtypes,
+            "metadata": self.metadata,
+        }
+        if self.venues is not None:
+            meta["venues"] = [str(x) for x in self.venues]
+            meta["venues_dtype"] = str(self.venues.dtype)
+            meta["venues_name"] = self.venues.name
+        with open(self.path / META_FILE, "w") as f:
+            json.dump(meta, f)
+
+    def _write(self, name: str, values: np.ndarray) -> None:
+        with open(self.path / f"{name}.bin", "ab") as f:
+            f.write(np.ascontiguousarray(values).tobytes())
+
+    def _files(self) -> list[str]:
+        names = ["index", "cash", "capital", "venue_cash", "venue_equity"]
+        names += RESULT_KEYS
+        names += [f"total_{key}" for key in TOTAL_KEYS]
+        return [f"{name}.bin" for name in names]
+
+
+def save_result(
+    result: BacktestResult,
+    path: str | os.PathLike,
+    dtype: str | Mapping[str, str] = "float64",
+    metadata: Mapping[str, Any] | None = None,
+) -> None:
+    """
+    Save a result holding the per asset ledger in the store format
+    of a ResultSink, with float fields as float64 or float32.
+    Run metadata, such as the backtest params, must be JSON serializable.
+    """
+    with ResultSink(path, result.assets, dtype=dtype, metadata=metadata) as sink:
+        sink.append(result)
+
+
+def load_metadata(path: str | os.PathLike) -> dict[str, Any]:
+    """
+    Run metadata saved with a result.
+    """
+    with open(Path(path) / META_FILE) as f:
+        return json.load(f).get("metadata", {})
+
+
+def load_result(
+    path: str | os.PathLike,
+    mmap: bool = True,
+    keys: Sequence[str] | None = None,
+    start: Any = None,
+    end: Any = None,
+) -> BacktestResult:
+    """
+    Load a result written by a ResultSink.
+    Asset and venue labels are restored to the dtype they were saved with.
+    The arrays are memory mapped by default so only the parts accessed
+    are read from disk.
+    Keys select the result keys of the per asset ledger to load, with an
+    empty list loading only the totals, which is enough for backtest_stats.
+    Start and end select the periods to load by label, both inclusive.
+    """
+    path = Path(path)
+    with open(path / META_FILE) as f:
+        meta = json.load(f)
+
+    if meta.get("format") != FORMAT:
+        raise ValueError(f"store format must be {FORMAT}")
+
+    if keys is None:
+        keys = RESULT_KEYS
+    unknown = set(keys) - set(RESULT_KEYS)
+    if unknown:
+        raise ValueError(f"keys must be in {RESULT_KEYS}")
+
+    periods = meta["periods"]
+    assets = pd.Index(meta["assets"], dtype=object).astype(meta["assets_dtype"])
+    dtypes = meta["dtypes"]
+
+    def read(
+        name: str, dtype: np.dtype | str, row: tuple, start: int, stop: int
+    ) -> np.ndarray:
+        # Rows from start to stop of a file of rows of the given shape
+        shape = (stop - start, *row)
+        count = int(np.prod(shape))
+        offset = start * np.dtype(dtype).itemsize * int(np.prod(row))
+        file = path / f"{name}.bin"
+        if count == 0:
+            return np.zeros(shape, dtype=dtype)
+        if mmap:
+            return np.memmap(file, dtype=dtype, mode="r", offset=offset, shape=shape)
+        with open(file, "rb") as f:
+            f.seek(offset)
+            return np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+
+    index = pd.Index(read("index", meta["index_dtype"] or np.int64, (), 0, periods))
+    if meta["index_tz"] is not None:
+        index = pd.DatetimeIndex(index, tz="UTC").tz_convert(meta["index_tz"])
+    i, j = index.slice_locs(start, end)
+    index = index[i:j]
+
+    fields = None
+    if len(keys) > 0:
+        fields = {}
+        for key in keys:
+            if key == "is_trade":
+                row = (-(-len(assets) // 8),)
+                packed = read(key, np.uint8, row, i, j)
+                unpacked = np.unpackbits(packed, axis=1, count=len(assets))
+                fields[key] = unpacked.view(bool)
+            else:
+                fields[key] = read(key, dtypes[key], (len(assets),), i, j)
+    totals = {key: read(f"total_{key}", np.float64, (), i, j) for key in TOTAL_KEYS}
+
+    # Periods before the start are taken as an earlier simulation
+    opening_cash = meta["opening_cash"]
+    if i > 0:
+        opening_cash = float(read("cash", np.float64, (), i - 1, i)[0])
+    simulated = min(max(meta["simulated"] - i, 0), j - i)
+
+    venues = venue_cash = venue_equity = None
+    if meta["venues"] is not None:
+        venues = pd.Index(
+            meta["venues"], dtype=object, name=meta["venues_name"]
+        ).astype(meta["venues_dtype"])
+        venue_cash = read("venue_cash", np.float64, (len(venues),), i, j)
+        venue_equity = read("venue_equity", np.float64, (len(venues),), i, j)
+
+    return BacktestResult(
+        index,
+        assets,
+        fields,
+        totals,
+        read("cash", np.float64, (), i, j),
+        read("capital", np.float64, (), i, j),
+        meta["initial_capital"],
+        simulated,
+        opening_cash=opening_cash,
+        venues=venues,
+        venue_cash=venue_cash,
+        venue_equity=venue_equity,
+    )
@@ -1,3 +1,5 @@
+from typing import NamedTuple
+
 import numpy as np
 import pandas as pd
 
@@ -28,3 +30,85 @@ def like(
 
 def fillnan(x: pd.Series | pd.DataFrame, y: float) -> pd.Series | pd.DataFrame:
     return x.replace([np.inf, -np.inf], np.nan).fillna(y)
+
+
+def to_array(x: pd.DataFrame) -> np.ndarray:
+    return np.ascontiguousarray(x.to_numpy(dtype=np.float64))
+
+
+class PreparedInputs(NamedTuple):
+    """
+    Backtest inputs validated and converted once to contiguous float64
+    arrays of shape (periods, assets) with columns ordered as the weights.
+    Pass in place of the prices to run many backtests over the same inputs
+    without repeating the checks and conversions.
+    Funding rates are a read-only broadcast view of zeros when none are given.
+    """
+
+    index: pd.Index
+    assets: pd.Index
+    prices: np.ndarray
+    weights: np.ndarray
+    funding_rates: np.ndarray
+
+    def frames(self) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """
+        Prices, weights and funding rates as frames.
+        """
+        return tuple(
+            pd.DataFrame(x, index=self.index, columns=self.assets)
+            for x in (self.prices, self.weights, self.funding_rates)
+        )
+
+
+def prepare_inputs(
+    prices: pd.DataFrame,
+    weights: pd.DataFrame,
+    funding_rates: pd.DataFrame | None = None,
+) -> PreparedInputs:
+    """
+    Validate, align and convert backtest inputs to arrays.
+    Frames holding a single C-contiguous float64 block in the order of the
+    weights, such as built from a 2-D array, are adopted without a copy.
+    Other frames are copied once, including those read with read_csv,
+    whose values pandas stores column-major.
+    """
+    if len(prices) == 0:
+        raise ValueError("prices length must be greater than 0")
+
+    if len(weights) == 0:
+        raise ValueError("weights length must be greater than 0")
+
+    if prices.shape != weights.shape:
+        raise ValueError("shape of prices must match weights")
+
+    if set(prices.columns) != set(weights.columns):
+        raise ValueError("columns of prices must match weights")
+
+    assets = weights.columns
+
+    def adopt(x: pd.DataFrame) -> np.ndarray:
+        if not x.columns.equals(assets):
+            x = x[assets]
+        return to_array(x)
+
+    prices_array = adopt(prices)
+    if np.isnan(prices_array).any():
+        raise ValueError("prices must not have any NaNs")
+
+    weights_array = to_array(weights)
+    if np.isnan(weights_array).any():
+        raise ValueError("weights must not have any NaNs")
+
+    if funding_rates is None:
+        funding_array = np.broadcast_to(np.zeros(len(assets)), weights.shape)
+    else:
+        if funding_rates.shape != weights.shape:
+            raise ValueError("shape of funding_rates must match weights")
+        funding_array = adopt(funding_rates)
+        if np.isnan(funding_array).any():
+            raise ValueError("funding must not have any NaNs")
+
+    return PreparedInputs(
+        weights.index, assets, prices_array, weights_array, funding_array
+    )
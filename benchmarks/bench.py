@@ -0,0 +1,277 @@
+"""
+Benchmark throughput of the backtest engine and stats over synthetic universes.
+
+Each case is timed over repeats and reports the best time, bars x assets
+per second and the peak memory traced during the call. Results are written
+as JSON with the commit and environment so runs can be compared across
+commits, for example:
+
+    python benchmarks/bench.py --preset quick --output bench.json
+    python benchmarks/bench.py --compare base.json bench.json
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from functools import partial
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+import alphasim.backtest as bt
+import alphasim.commission as cm
+import alphasim.money as mn
+import alphasim.stats as stats
+from alphasim.portfolio import allocate, distribute_longshort
+
+PRESETS = {
+    "quick": {"assets": [10, 100], "periods": [1_000, 10_000]},
+    "full": {
+        "assets": [10, 100, 500, 2_000],
+        "periods": [1_000, 10_000, 100_000, 1_000_000],
+    },
+}
+
+GRID_CONFIGS = [1, 100, 1_000]
+
+MONEY_FUNCS = [mn.initial_capital, mn.total_equity, mn.sqrt_profit]
+
+COMMISSION_FUNCS = {
+    "zero": cm.zero_commission,
+    "fixed": partial(cm.fixed_commission, fixed_commission=0.01),
+    "linear": partial(cm.linear_pct_commission, pct_commission=0.001),
+    "tiered": partial(
+        cm.tiered_pct_commission,
+        min_fee_per_order=1,
+        fee_per_unit=0.005,
+        max_pct_per_order=0.01,
+    ),
+}
+
+
+def synthetic_universe(
+    periods: int, assets: int, seed: int = 0
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Random walk prices, weights with an absolute sum of 1 and funding rates.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2000-01-01", periods=periods, freq="D")
+    columns = [f"A{i}" for i in range(assets)]
+
+    returns = rng.normal(0.0002, 0.01, size=(periods, assets))
+    prices = 100 * np.exp(np.cumsum(returns, axis=0))
+
+    weights = rng.normal(size=(periods, assets))
+    weights /= np.abs(weights).sum(axis=1, keepdims=True)
+
+    funding = rng.normal(0, 0.0001, size=(periods, assets))
+
+    def frame(x: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(x, index=index, columns=columns)
+
+    return frame(prices), frame(weights), frame(funding)
+
+
+def measure(func: Callable[[], Any], repeat: int) -> tuple[float, int]:
+    """
+    Best wall time of the func over repeats and the peak traced memory.
+    A first call warms up caches and any compilation.
+    """
+    func()
+
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak
+
+
+def cases(
+    sizes: list[tuple[int, int]], max_cells: int, engines: list[str]
+) -> list[dict[str, Any]]:
+    """
+    Cases to run, covering each option combination of the backtest
+    at the smallest size and the default options at every size,
+    and grid sweeps of growing numbers of configurations at the smallest size.
+    """
+    options = [
+        dict(spread=spread, funding=funding, discrete=discrete, commission=name)
+        for spread, funding, discrete, name in itertools.product(
+            [False, True], [False, True], [False, True], COMMISSION_FUNCS
+        )
+    ]
+    default = dict(spread=False, funding=False, discrete=False, commission="zero")
+
+    out = []
+    sizes = [s for s in sizes if s[0] * s[1] <= max_cells]
+    for i, (periods, assets) in enumerate(sizes):
+        for engine in engines:
+            for opts in options if i == 0 else [default]:
+                out.append(
+                    dict(
+                        name="backtest",
+                        periods=periods,
+                        assets=assets,
+                        engine=engine,
+                        **opts,
+                    )
+                )
+        if i == 0:
+            for configs in GRID_CONFIGS:
+                out.append(
+                    dict(
+                        name="backtest_grid",
+                        periods=periods,
+                        assets=assets,
+                        configs=configs,
+                    )
+                )
+        out.append(dict(name="backtest_stats", periods=periods, assets=assets))
+        out.append(dict(name="allocate", periods=1, assets=assets))
+        out.append(dict(name="distribute_longshort", periods=1, assets=assets))
+
+    return out
+
+
+def run_case(case: dict[str, Any], repeat: int) -> dict[str, Any]:
+    periods, assets = case["periods"], case["assets"]
+    prices, weights, funding = synthetic_universe(max(periods, 2), assets)
+    prices, weights, funding = prices[:periods], weights[:periods], funding[:periods]
+
+    match case["name"]:
+        case "backtest":
+
+            def func():
+                return bt.backtest(
+                    prices,
+                    weights,
+                    funding_rates=funding if case["funding"] else None,
+                    trade_buffer=0.01,
+                    commission_func=COMMISSION_FUNCS[case["commission"]],
+                    money_func=mn.total_equity,
+                    discrete_shares=case["discrete"],
+                    spread_f=0.001 if case["spread"] else 0,
+                    engine=case["engine"],
+                    output="summary",
+                )
+
+        case "backtest_grid":
+            # Configurations vary the buffer and cycle the built-in money funcs
+            params = [
+                dict(trade_buffer=0.01 * (k % 5), money_func=MONEY_FUNCS[k % 3])
+                for k in range(case["configs"])
+            ]
+
+            def func():
+                return bt.backtest_grid(prices, weights, params)
+
+        case "backtest_stats":
+            result = bt.backtest(prices, weights, output="summary")
+
+            def func():
+                return stats.backtest_stats(result)
+
+        case "allocate":
+            price = prices.iloc[-1]
+            port = weights.iloc[0] * 1000 / price
+
+            def func():
+                return allocate(1000, price, port * price, weights.iloc[-1], 0.01)
+
+        case "distribute_longshort":
+
+            def func():
+                return distribute_longshort(weights.iloc[-1], max=2 / assets)
+
+    seconds, peak = measure(func, repeat)
+    return {
+        **case,
+        "seconds": seconds,
+        "cells_per_second": periods * assets / seconds,
+        "peak_memory_bytes": peak,
+    }
+
+
+def environment() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "timestamp": pd.Timestamp.now(tz="UTC").isoformat(),
+    }
+
+
+def compare(base_path: str, new_path: str) -> pd.DataFrame:
+    """
+    Ratio of the throughput of each case in the new results to the base.
+    """
+    keys = ["name", "periods", "assets", "engine"]
+    keys += ["spread", "funding", "discrete", "commission", "configs"]
+
+    def load(path: str) -> pd.DataFrame:
+        with open(path) as f:
+            df = pd.DataFrame(json.load(f)["results"])
+        return df.reindex(columns=keys + ["cells_per_second"]).fillna("")
+
+    merged = load(base_path).merge(load(new_path), on=keys, suffixes=("_base", ""))
+    merged["speedup"] = merged["cells_per_second"] / merged["cells_per_second_base"]
+    return merged
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--preset", choices=list(PRESETS), default="quick")
+    parser.add_argument("--assets", type=int, nargs="*")
+    parser.add_argument("--periods", type=int, nargs="*")
+    parser.add_argument("--engines", nargs="*", default=["auto", "numpy"])
+    parser.add_argument("--max-cells", type=int, default=50_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print(compare(*args.compare).to_string())
+        return
+
+    preset = PRESETS[args.preset]
+    sizes = list(
+        itertools.product(
+            args.periods or preset["periods"], args.assets or preset["assets"]
+        )
+    )
+
+    results = []
+    for case in cases(sizes, args.max_cells, args.engines):
+        results.append(run_case(case, args.repeat))
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+from functools import partial
+
+import pandas as pd
+
+import alphasim.backtest as bt
+import alphasim.commission as cm
+import alphasim.money as mn
+from alphasim.cache import ResultCache, cache_key
+
+
+def test_cache_key():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+
+    def key(*args, **kwargs):
+        return cache_key(bt.backtest, *args, **kwargs)
+
+    linear = partial(cm.linear_pct_commission, pct_commission=0.001)
+    expected = key(prices, weights, trade_buffer=0.1, commission_func=linear)
+
+    # Args are identified by content and position does not matter
+    assert expected == key(
+        prices.copy(), weights.copy(), None, False, 0.1, commission_func=linear
+    )
+    assert expected == key(
+        prices,
+        weights,
+        trade_buffer=0.1,
+        commission_func=partial(cm.linear_pct_commission, pct_commission=0.001),
+    )
+
+    changed = weights.copy()
+    changed.iloc[10, 1] += 1e-12
+    assert expected != key(prices, changed, trade_buffer=0.1, commission_func=linear)
+    assert expected != key(prices, weights, trade_buffer=0.2, commission_func=linear)
+    other = partial(cm.linear_pct_commission, pct_commission=0.002)
+    assert expected != key(prices, weights, trade_buffer=0.1, commission_func=other)
+    assert key(prices, weights, money_func=mn.total_equity) != key(
+        prices, weights, money_func=mn.sqrt_profit
+    )
+
+
+def test_result_cache(tmp_path):
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+    kwargs = dict(trade_buffer=0.1, money_func=mn.total_equity)
+
+    cache = ResultCache(path=tmp_path)
+    result = cache.backtest(prices, weights, output="result", **kwargs)
+    assert cache.backtest(prices, weights, output="result", **kwargs) is result
+    stats = cache.backtest_stats(result)
+    assert cache.backtest_stats(result) is stats
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    # Results are reloaded from disk by a new cache
+    reloaded = ResultCache(path=tmp_path)
+    frame = reloaded.backtest(prices, weights, output="result", **kwargs).to_frame()
+    assert frame.equals(result.to_frame())
+    assert reloaded.hits == 1
+
+    # Lambdas cannot be identified so are not cached
+    cache.backtest(prices, weights, commission_func=lambda x, y: 0.0)
+    assert cache.misses == 2
+
+    # Least recently used results are evicted over the size budget
+    small = ResultCache(max_bytes=2 * result.totals["equity"].nbytes * 7)
+    for trade_buffer in [0, 0.1, 0.2]:
+        small.backtest(prices, weights, trade_buffer=trade_buffer, output="summary")
+    assert len(small._entries) == 1
+    assert small.nbytes <= small.max_bytes
+    small.backtest(prices, weights, trade_buffer=0.2, output="summary")
+    assert small.hits == 1
+
+    disk = ResultCache(path=tmp_path / "disk", max_disk_bytes=1)
+    disk.backtest(prices, weights, output="summary")
+    assert list((tmp_path / "disk").glob("*.pkl")) == []
+
+
+def _load_test_data(filename, dtype=float):
+    wd = os.getcwd()
+    return pd.read_csv(
+        f"{wd}/tests/data/{filename}",
+        index_col="dt",
+        parse_dates=["dt"],
+        dtype=dtype,
+    )
@@ -0,0 +1,170 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import alphasim.backtest as bt
+import alphasim.money as mn
+import alphasim.stats as stats
+from alphasim.chunked import backtest_chunked, frame_chunks, npy_chunks, parquet_chunks
+from alphasim.store import ResultSink, load_metadata, load_result, save_result
+
+
+def test_backtest_chunked(tmp_path):
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+    kwargs = dict(trade_buffer=0.1, discrete_shares=True, money_func=mn.total_equity)
+
+    expected = bt.backtest(prices, weights, **kwargs)
+
+    chunks = frame_chunks(prices, weights, chunksize=700)
+    result = backtest_chunked(chunks, sink=tmp_path / "result", **kwargs)
+    assert isinstance(result.fields["price"], np.memmap)
+    assert result.to_frame().equals(expected)
+
+    chunks = frame_chunks(prices, weights, chunksize=700)
+    summary = backtest_chunked(chunks, **kwargs)
+    assert summary.fields is None
+    assert np.allclose(
+        stats.backtest_stats(summary).loc["cagr":].astype(np.float64),
+        stats.backtest_stats(expected).loc["cagr":].astype(np.float64),
+        equal_nan=True,
+    )
+
+
+def test_result_sink(tmp_path):
+    prices = _load_test_data("stonk_prices.csv").iloc[:100]
+    weights = _load_test_data("stonk_weights.csv").iloc[:100]
+
+    result = bt.backtest(prices, weights, output="result")
+    with ResultSink(tmp_path, result.assets) as sink:
+        sink.append(result)
+
+    loaded = load_result(tmp_path, mmap=False)
+    assert loaded.to_frame().equals(result.to_frame())
+    assert loaded.periods == result.periods
+
+    with pytest.raises(ValueError):
+        ResultSink(tmp_path, pd.Index(["Acme"])).append(result)
+
+    # Truncating a store removes its metadata until closed
+    ResultSink(tmp_path, result.assets)
+    with pytest.raises(FileNotFoundError):
+        load_result(tmp_path)
+
+    # Timezones of the index and the dtype of the asset labels are kept
+    prices.index = prices.index.tz_localize("America/New_York")
+    prices.columns = pd.RangeIndex(len(prices.columns))
+    weights.index, weights.columns = prices.index, prices.columns
+    result = bt.backtest(prices, weights, output="result")
+    save_result(result, tmp_path)
+    loaded = load_result(tmp_path, start=prices.index[10])
+    assert loaded.index.equals(prices.index[10:])
+    assert str(loaded.index.tz) == "America/New_York"
+    assert loaded.assets.equals(prices.columns)
+    assert loaded.assets.dtype == np.int64
+
+
+def test_save_result(tmp_path):
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+
+    result = bt.backtest(prices, weights, trade_buffer=0.1, output="result")
+    save_result(result, tmp_path, dtype="float32", metadata={"trade_buffer": 0.1})
+    assert load_metadata(tmp_path) == {"trade_buffer": 0.1}
+
+    # is_trade is stored as a bitmap of the assets of each period
+    assert (tmp_path / "is_trade.bin").stat().st_size == len(weights)
+    assert (tmp_path / "price.bin").stat().st_size == 4 * prices.size
+
+    loaded = load_result(tmp_path)
+    assert loaded.fields["price"].dtype == np.float32
+    assert np.array_equal(loaded.fields["is_trade"], result.fields["is_trade"])
+    assert np.allclose(
+        loaded.to_frame().astype(np.float64),
+        result.to_frame().astype(np.float64),
+        equal_nan=True,
+    )
+
+    # Stats run on the totals alone
+    summary = load_result(tmp_path, keys=[])
+    assert summary.fields is None
+    assert stats.backtest_stats(summary).equals(stats.backtest_stats(result))
+
+    # Projection of keys and periods
+    start, end = weights.index[500], weights.index[899]
+    part = load_result(tmp_path, keys=["is_trade", "equity"], start=start, end=end)
+    assert part.keys() == ["equity", "is_trade"]
+    assert part.index.equals(weights.index[500:900])
+    assert part.periods == 400
+    assert part.opening_cash == result.cash[499]
+    expected = result.fields["equity"][500:900].astype(np.float32)
+    assert np.array_equal(part.fields["equity"], expected)
+    frame = result.to_frame().loc[start:end, ["equity", "is_trade"]]
+    assert part.to_frame()["is_trade"].equals(frame["is_trade"])
+    assert np.allclose(part.to_frame()["equity"], frame["equity"].astype(np.float64))
+
+    with pytest.raises(ValueError):
+        save_result(result, tmp_path, dtype="float16")
+
+    # Venue ledgers are kept with their venues
+    venues = {"VTI": "ibkr", "TLT": "ibkr", "GLD": "cme"}
+    result = bt.backtest(prices, weights, venues=venues, output="result")
+    save_result(result, tmp_path)
+    loaded = load_result(tmp_path, keys=[], start=weights.index[100])
+    assert loaded.venue_totals().equals(result.venue_totals().iloc[100:])
+
+
+def test_npy_chunks(tmp_path):
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+
+    np.save(tmp_path / "prices.npy", prices.to_numpy())
+    np.save(tmp_path / "weights.npy", weights.to_numpy())
+
+    chunks = npy_chunks(
+        tmp_path / "prices.npy",
+        tmp_path / "weights.npy",
+        index=weights.index,
+        columns=weights.columns,
+        chunksize=500,
+    )
+    result = backtest_chunked(chunks, sink=tmp_path / "result")
+    assert result.to_frame().equals(bt.backtest(prices, weights))
+
+
+def test_parquet_chunks(tmp_path):
+    pytest.importorskip("pyarrow")
+
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+
+    prices.to_parquet(tmp_path / "prices.parquet", row_group_size=300)
+    weights.to_parquet(tmp_path / "weights.parquet", row_group_size=800)
+
+    chunks = parquet_chunks(
+        tmp_path / "prices.parquet",
+        tmp_path / "weights.parquet",
+        index_col="dt",
+        chunksize=500,
+    )
+    result = backtest_chunked(chunks)
+    expected = bt.backtest(prices, weights, output="result")
+    assert result.index.equals(expected.index)
+    assert np.array_equal(result.total_equity(), expected.total_equity())
+
+    # Sources of different lengths fail before any chunk is read
+    weights.iloc[:-1].to_parquet(tmp_path / "short.parquet")
+    with pytest.raises(ValueError):
+        next(parquet_chunks(tmp_path / "prices.parquet", tmp_path / "short.parquet"))
+
+
+def _load_test_data(filename, dtype=float):
+    wd = os.getcwd()
+    return pd.read_csv(
+        f"{wd}/tests/data/{filename}",
+        index_col="dt",
+        parse_dates=["dt"],
+        dtype=dtype,
+    )
@@ -0,0 +1,53 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import alphasim.backtest as bt
+import alphasim.commission as cm
+
+
+def test_commission_vectorized():
+    trade_size = np.array([0, 2.5, -10, 100])
+    trade_value = np.array([0, 250, -1000, 10000])
+
+    models = [
+        cm.zero_commission,
+        partial(cm.fixed_commission, fixed_commission=1),
+        partial(cm.linear_pct_commission, pct_commission=0.001),
+        partial(
+            cm.tiered_pct_commission,
+            min_fee_per_order=1,
+            fee_per_unit=0.005,
+            max_pct_per_order=0.01,
+        ),
+    ]
+
+    for model in models:
+        assert cm.as_vectorized(model) is model
+        fees = model(trade_size, trade_value)
+        expected = [model(float(x), float(y)) for x, y in zip(trade_size, trade_value)]
+        assert np.array_equal(fees, expected)
+
+    # Fixed fees do not depend on the trade value, even when it is not finite
+    bad = np.array([np.nan, np.inf])
+    assert np.array_equal(cm.zero_commission(bad, bad), [0, 0])
+    assert np.array_equal(cm.fixed_commission(bad, bad, 1), [-1, -1])
+    assert type(cm.zero_commission(1.0, np.nan)) is float
+    assert cm.fixed_commission(1.0, np.inf, 1) == -1
+
+
+def test_commission_scalar_wrapped():
+    def per_trade(trade_size: float, trade_value: float) -> float:
+        return -1.0 if trade_size != 0 else 0.0
+
+    wrapped = cm.as_vectorized(per_trade)
+    fees = wrapped(np.array([[0, 1], [-1, 0]]), np.array([[0, 10], [-10, 0]]))
+    assert np.array_equal(fees, [[0, -1], [-1, 0]])
+
+    prices = pd.DataFrame([10, 15, 30], columns=["Acme"])
+    weights = pd.DataFrame([0.5, 1, 0], columns=["Acme"])
+    result = bt.backtest(prices, weights, commission_func=per_trade)
+
+    assert result.loc[(0, bt.CASH)]["end_portfolio"] == 499
+    assert result["commission"].sum() == -3
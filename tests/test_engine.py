@@ -0,0 +1,320 @@
+import os
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import alphasim.backtest as bt
+import alphasim.commission as cm
+import alphasim.kernel as kernel
+import alphasim.money as mn
+from alphasim.engine import Engine, simulate
+from alphasim.portfolio import instrument_table
+from alphasim.profiling import STAGES, Profiler
+from alphasim.util import prepare_inputs
+
+
+def test_engine_parity_crypto():
+    prices = _load_test_data("crypto_prices.csv").fillna(0).iloc[:365]
+    weights = _load_test_data("crypto_weights.csv").fillna(0).iloc[:365]
+    funding = weights.abs() * 0.0001
+
+    kwargs = dict(
+        funding_rates=funding,
+        trade_buffer=0.05,
+        money_func=mn.total_equity,
+        commission_func=partial(cm.linear_pct_commission, pct_commission=0.001),
+        funding_on_abs_position=True,
+        short_f=0.5,
+        spread_f=0.01,
+    )
+
+    _assert_parity(prices, weights, **kwargs)
+
+
+def test_engine_parity_stonks():
+    prices = _load_test_data("stonk_prices.csv").fillna(0)
+    weights = _load_test_data("stonk_weights.csv").fillna(0)
+
+    _assert_parity(prices, weights, trade_buffer=0.1, discrete_shares=True)
+
+
+def test_engine_rekt():
+    prices = pd.DataFrame([10, 10, 30, 40], columns=["Acme"])
+    weights = pd.DataFrame([-2, -2, -2, -2], columns=["Acme"])
+
+    _assert_parity(prices, weights)
+
+
+def test_engine_prepared_inputs():
+    prices = _load_test_data("stonk_prices.csv").fillna(0)
+    weights = _load_test_data("stonk_weights.csv").fillna(0)
+    prices = prices[prices.columns[::-1]]
+
+    inputs = prepare_inputs(prices, weights)
+    assert inputs.funding_rates.strides[0] == 0
+
+    values = np.ascontiguousarray(weights.to_numpy())
+    adopted = prepare_inputs(
+        prices, pd.DataFrame(values, weights.index, weights.columns)
+    )
+    assert np.shares_memory(adopted.weights, values)
+
+    for trade_buffer in [0, 0.1]:
+        expected = bt.backtest(prices, weights, trade_buffer=trade_buffer)
+        actual = bt.backtest(inputs, trade_buffer=trade_buffer)
+        assert expected.equals(actual)
+
+    _assert_parity(inputs, None, trade_buffer=0.1)
+
+    with pytest.raises(ValueError):
+        bt.backtest(inputs, weights)
+
+
+def test_engine_instruments():
+    prices = _load_test_data("crypto_prices.csv").fillna(0).iloc[:365]
+    weights = _load_test_data("crypto_weights.csv").fillna(0).iloc[:365]
+
+    instruments = instrument_table(
+        weights.columns, lot_step=0.01, min_notional=5, price_precision=2
+    )
+    instruments.iloc[::2, 0] = 1
+
+    _assert_parity(
+        prices,
+        weights,
+        trade_buffer=0.05,
+        instruments=instruments,
+        money_func=mn.total_equity,
+        spread_f=0.01,
+    )
+
+    result = bt.backtest(prices, weights, instruments=instruments, output="result")
+    base_qty = result.fields["base_qty"]
+    assert np.allclose(base_qty[:, ::2], np.round(base_qty[:, ::2]))
+    assert np.allclose(base_qty, np.round(base_qty, 2))
+
+    # Liquidations close positions of any value
+    quote_qty = np.abs(result.fields["quote_qty"])
+    placed = (quote_qty > 0) & (result.fields["target_weight"] != 0)
+    assert (quote_qty[placed] >= 5).all()
+
+
+def test_kernel_parity():
+    pytest.importorskip("numba")
+
+    prices = _load_test_data("crypto_prices.csv").fillna(0).iloc[:365]
+    weights = _load_test_data("crypto_weights.csv").fillna(0).iloc[:365]
+    funding = weights.abs() * 0.0001
+
+    commission_funcs = [
+        cm.zero_commission,
+        partial(cm.fixed_commission, fixed_commission=0.1),
+        partial(cm.linear_pct_commission, pct_commission=0.001),
+        partial(
+            cm.tiered_pct_commission,
+            min_fee_per_order=1,
+            fee_per_unit=0.005,
+            max_pct_per_order=0.01,
+        ),
+    ]
+    money_funcs = [mn.initial_capital, mn.total_equity, mn.sqrt_profit]
+
+    for i, commission_func in enumerate(commission_funcs):
+        kwargs = dict(
+            funding_rates=funding,
+            trade_buffer=0.05 * (i % 2),
+            commission_func=commission_func,
+            money_func=money_funcs[i % 3],
+            funding_on_abs_position=i % 2 == 0,
+            discrete_shares=i >= 2,
+            short_f=0.5,
+            spread_f=0.01 * (i % 2),
+        )
+        expected = bt.backtest(prices, weights, engine="numpy", **kwargs)
+        actual = bt.backtest(prices, weights, engine="numba", **kwargs)
+        assert expected.equals(actual)
+
+    # Rekt ends the simulation at the same period
+    prices = pd.DataFrame([10, 10, 30, 40], columns=["Acme"])
+    weights = pd.DataFrame([-2, -2, -2, -2], columns=["Acme"])
+    expected = bt.backtest(prices, weights, engine="numpy", output="result")
+    actual = bt.backtest(prices, weights, engine="numba", output="result")
+    assert actual.periods == expected.periods == 2
+    assert actual.to_frame().equals(expected.to_frame())
+
+
+def test_kernel_array_params():
+    prices = _load_test_data("stonk_prices.csv").fillna(0).iloc[:200]
+    weights = _load_test_data("stonk_weights.csv").fillna(0).iloc[:200]
+
+    # Fees per asset are not compiled so auto runs the numpy engine
+    commission_func = partial(
+        cm.linear_pct_commission, pct_commission=np.array([0.001, 0.002, 0.003])
+    )
+    assert kernel.commission_code(commission_func) is None
+    assert not kernel.supports(mn.initial_capital, commission_func)
+
+    expected = bt.backtest(
+        prices, weights, engine="numpy", commission_func=commission_func
+    )
+    actual = bt.backtest(prices, weights, commission_func=commission_func)
+    assert expected.equals(actual)
+
+
+def test_engine_sparse():
+    prices = _load_test_data("crypto_prices.csv").fillna(0).iloc[:365]
+    weights = _load_test_data("crypto_weights.csv").fillna(0).iloc[:365]
+    weights = weights.iloc[::24].reindex(weights.index, method="ffill")
+    inputs = prepare_inputs(prices, weights, weights.abs() * 0.0001)
+
+    def run(sparse):
+        engine = Engine(
+            len(inputs.assets),
+            True,
+            [0.05, 0.2, 0],
+            [
+                cm.zero_commission,
+                partial(cm.fixed_commission, fixed_commission=0.1),
+                partial(cm.linear_pct_commission, pct_commission=0.001),
+            ],
+            [1000] * 3,
+            [mn.total_equity] * 3,
+            False,
+            [1, 1, 0.5],
+            [0.01] * 3,
+        )
+        assert engine.sparse
+        engine.sparse = sparse
+        return simulate(inputs.prices, inputs.weights, inputs.funding_rates, engine)
+
+    expected, actual = run(False), run(True)
+    for key in expected.fields:
+        assert np.array_equal(expected.fields[key], actual.fields[key]), key
+    for key in expected.totals:
+        assert np.array_equal(expected.totals[key], actual.totals[key]), key
+    assert np.array_equal(expected.cash, actual.cash)
+
+
+def test_engine_profiler():
+    prices = _load_test_data("stonk_prices.csv").fillna(0)
+    weights = _load_test_data("stonk_weights.csv").fillna(0)
+    kwargs = dict(trade_buffer=0.1, spread_f=0.01, money_func=mn.total_equity)
+
+    reports = []
+    profiler = Profiler(callback=reports.append, memory=True)
+    expected = bt.backtest(prices, weights, engine="numpy", **kwargs)
+    actual = bt.backtest(prices, weights, profiler=profiler, **kwargs)
+    assert expected.equals(actual)
+
+    assert len(reports) == 1
+    report = reports[0]
+    assert report.index.tolist() == STAGES
+    assert (report["calls"] > 0).all()
+    assert (report["calls"] <= len(weights)).all()
+    assert (report["seconds"] >= 0).all()
+    assert np.isclose(report["pct"].sum(), 1)
+    assert report.loc["result_write", "allocated_bytes"] >= 0
+    assert report["allocated_blocks"].dtype == np.int64
+    assert report["allocated_blocks"].abs().sum() > 0
+
+    with pytest.raises(ValueError):
+        bt.backtest(prices, weights, engine="numba", profiler=Profiler())
+
+
+def test_engine_venues():
+    prices = _load_test_data("crypto_prices.csv").fillna(0).iloc[:365]
+    weights = _load_test_data("crypto_weights.csv").fillna(0).iloc[:365]
+    weights = weights.iloc[::24].reindex(weights.index, method="ffill")
+    inputs = prepare_inputs(prices, weights, weights.abs() * 0.0001)
+    venues = np.arange(len(inputs.assets)) % 2
+
+    def run(sparse):
+        engine = Engine(
+            len(inputs.assets),
+            True,
+            [0.05, 0.2],
+            [
+                partial(cm.fixed_commission, fixed_commission=0.1),
+                partial(cm.linear_pct_commission, pct_commission=0.001),
+            ],
+            [1000] * 2,
+            [mn.total_equity] * 2,
+            False,
+            [1, 0.5],
+            [0.01] * 2,
+            venues=venues,
+            venue_cash=np.array([[600, 300, 100]] * 2),
+        )
+        engine.sparse = sparse
+        return simulate(inputs.prices, inputs.weights, inputs.funding_rates, engine)
+
+    expected, actual = run(False), run(True)
+    assert np.array_equal(expected.venue_cash, actual.venue_cash)
+    assert np.array_equal(expected.venue_equity, actual.venue_equity)
+
+    # Venues split the cash and equity of the portfolio,
+    # a venue without assets keeps its opening cash
+    assert np.allclose(actual.venue_cash.sum(axis=2), actual.cash)
+    assert np.allclose(actual.venue_equity.sum(axis=2), actual.totals["equity"])
+    for k, n in enumerate(actual.periods):
+        assert (actual.venue_cash[k, :n, 2] == 100).all()
+
+    # Backtests across venues match the totals of a single cash balance
+    kwargs = dict(trade_buffer=0.05, money_func=mn.total_equity, output="result")
+    asset_venues = dict(zip(weights.columns, ["binance", "bybit"] * len(venues)))
+    result = bt.backtest(
+        prices,
+        weights,
+        venues=asset_venues,
+        initial_capital={"bybit": 400, "binance": 600},
+        **kwargs,
+    )
+    baseline = bt.backtest(prices, weights, engine="numpy", **kwargs)
+    assert np.array_equal(result.cash, baseline.cash)
+    assert np.array_equal(result.totals["equity"], baseline.totals["equity"])
+
+    totals = result.venue_totals()
+    assert totals.columns.tolist() == [
+        (key, venue) for key in ["cash", "equity"] for venue in ["bybit", "binance"]
+    ]
+    assert np.allclose(totals["cash"].sum(axis=1), result.cash)
+
+    with pytest.raises(ValueError):
+        baseline.venue_totals()
+
+    with pytest.raises(ValueError):
+        bt.backtest(prices, weights, venues={"BTC": "binance"}, output="result")
+
+    with pytest.raises(ValueError):
+        bt.backtest(prices, weights, venues=asset_venues)
+
+    with pytest.raises(ValueError):
+        bt.backtest(prices, weights, initial_capital={"binance": 1000})
+
+
+def _assert_parity(prices, weights, **kwargs):
+    expected = bt.backtest(prices, weights, engine="pandas", **kwargs)
+    actual = bt.backtest(prices, weights, engine="numpy", **kwargs)
+
+    assert expected.index.equals(actual.index)
+    assert expected.columns.equals(actual.columns)
+
+    # The reference leaves the cash row of is_trade empty
+    expected["is_trade"] = expected["is_trade"].fillna(False)
+
+    for key in bt.RESULT_KEYS:
+        exp = expected[key].astype(np.float64).to_numpy()
+        act = actual[key].astype(np.float64).to_numpy()
+        assert np.array_equal(exp, act, equal_nan=True), key
+
+
+def _load_test_data(filename, dtype=float):
+    wd = os.getcwd()
+    return pd.read_csv(
+        f"{wd}/tests/data/{filename}",
+        index_col="dt",
+        parse_dates=["dt"],
+        dtype=dtype,
+    )
@@ -0,0 +1,89 @@
+import os
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import alphasim.backtest as bt
+import alphasim.const as const
+import alphasim.execution as ex
+import alphasim.money as mn
+
+
+def test_execution_models():
+    price = np.array([100.0, 100, 50, 0])
+    trade_size = np.array([10.0, -10, 0, 5])
+
+    fill = ex.fixed_slippage(price, trade_size, 0)
+    slip = 100 * const.FIXED_SLIPPAGE
+    assert np.array_equal(fill, [100 + slip, 100 - slip, 50, 0])
+
+    fill = ex.half_spread(price, trade_size, 0, spread_f=0.02)
+    assert np.array_equal(fill, [101, 99, 50, 0])
+
+    fill = ex.sqrt_impact(price, trade_size, 0, adv=1000, volatility=0.02, k=0.5)
+    impact = 0.5 * 0.02 * np.sqrt(10 / 1000)
+    assert np.allclose(fill, [100 * (1 + impact), 100 * (1 - impact), 50, 0])
+
+    # Inputs that vary over time are taken at the row of the period
+    adv = np.array([[1.0] * 4, [1000] * 4])
+    fill = ex.sqrt_impact(price, trade_size, 1, adv=adv, volatility=0.02, k=0.5)
+    assert np.allclose(fill, [100 * (1 + impact), 100 * (1 - impact), 50, 0])
+
+    # Impact grows with the square root of the trade size
+    fills = ex.sqrt_impact(100.0, np.array([1.0, 4, 16]), 0, adv=100, volatility=0.1)
+    assert np.allclose(np.diff(fills - 100), [1, 2])
+
+    composed = ex.compose(ex.fixed_slippage, partial(ex.half_spread, spread_f=0.02))
+    fill = composed(price, trade_size, 0)
+    assert np.array_equal(
+        fill,
+        ex.half_spread(ex.fixed_slippage(price, trade_size, 0), trade_size, 0, 0.02),
+    )
+
+
+def test_backtest_execution_func():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+    kwargs = dict(trade_buffer=0.05, money_func=mn.total_equity, spread_f=0.001)
+
+    # Volatility varies over time and is taken at the period of each trade
+    volatility = np.linspace(0.005, 0.05, len(prices))[:, None] * np.ones(3)
+    execution_func = ex.compose(
+        ex.fixed_slippage,
+        partial(ex.sqrt_impact, adv=np.array([1e5, 1e5, 1e4]), volatility=volatility),
+    )
+
+    expected = bt.backtest(
+        prices, weights, engine="pandas", execution_func=execution_func, **kwargs
+    )
+    actual = bt.backtest(prices, weights, execution_func=execution_func, **kwargs)
+    for key in bt.RESULT_KEYS:
+        exp = expected[key].astype(np.float64).fillna(0).to_numpy()
+        act = actual[key].astype(np.float64).fillna(0).to_numpy()
+        assert np.array_equal(exp, act), key
+
+    # Fills of the first trades cost more than trading at the quote price
+    baseline = bt.backtest(prices, weights, engine="numpy", **kwargs)
+    first = actual.loc[weights.index[0]].drop(bt.CASH)
+    assert first["base_qty"].equals(
+        baseline.loc[weights.index[0]].drop(bt.CASH)["base_qty"]
+    )
+    cost = (
+        first["quote_qty"] - baseline.loc[weights.index[0]].drop(bt.CASH)["quote_qty"]
+    )
+    assert (cost > 0).all()
+
+    with pytest.raises(ValueError):
+        bt.backtest(prices, weights, engine="numba", execution_func=execution_func)
+
+
+def _load_test_data(filename, dtype=float):
+    wd = os.getcwd()
+    return pd.read_csv(
+        f"{wd}/tests/data/{filename}",
+        index_col="dt",
+        parse_dates=["dt"],
+        dtype=dtype,
+    )
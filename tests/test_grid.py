@@ -0,0 +1,88 @@
+import os
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import alphasim.backtest as bt
+import alphasim.commission as cm
+import alphasim.money as mn
+import alphasim.stats as stats
+
+
+def test_backtest_grid_results():
+    prices = _load_test_data("crypto_prices.csv").fillna(0).iloc[:200]
+    weights = _load_test_data("crypto_weights.csv").fillna(0).iloc[:200]
+
+    params = [
+        dict(trade_buffer=0.05, short_f=0.5),
+        dict(trade_buffer=0.1, spread_f=0.01, money_func=mn.total_equity),
+        dict(commission_func=partial(cm.linear_pct_commission, pct_commission=0.001)),
+    ]
+    results = bt.backtest_grid(prices, weights, params, output="frame")
+
+    assert len(results) == len(params)
+    for p, result in zip(params, results):
+        assert result.equals(bt.backtest(prices, weights, **p))
+
+
+def test_backtest_grid_rekt():
+    prices = pd.DataFrame([10, 10, 30, 40], columns=["Acme"])
+    weights = pd.DataFrame([-2, -2, -2, -2], columns=["Acme"])
+
+    params = [dict(short_f=1), dict(short_f=0.1)]
+    results = bt.backtest_grid(prices, weights, params, output="result")
+
+    assert results[0].periods == 2
+    assert results[1].periods == 4
+    for p, result in zip(params, results):
+        assert result.to_frame().equals(bt.backtest(prices, weights, **p))
+
+
+def test_backtest_grid_money():
+    prices = _load_test_data("stonk_prices.csv").iloc[:300]
+    weights = _load_test_data("stonk_weights.csv").iloc[:300]
+
+    def half_equity(initial, total):
+        return total / 2
+
+    # Configurations sharing a money func are sized together, scalar funcs
+    # are called per configuration and period
+    params = [
+        dict(trade_buffer=tb, money_func=func)
+        for tb in [0, 0.05]
+        for func in [mn.initial_capital, mn.sqrt_profit, half_equity]
+    ]
+    results = bt.backtest_grid(prices, weights, params, output="frame")
+
+    for p, result in zip(params, results):
+        assert result.equals(bt.backtest(prices, weights, **p))
+
+
+def test_backtest_grid_stats():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+
+    params = [dict(trade_buffer=tb) for tb in [0, 0.05, 0.1, 0.2]]
+    grid_stats = bt.backtest_grid(
+        prices, weights, params, discrete_shares=True, output="stats"
+    )
+
+    assert grid_stats.shape[1] == len(params)
+    for k, p in enumerate(params):
+        result = bt.backtest(prices, weights, discrete_shares=True, **p)
+        expected = stats.backtest_stats(result)["result"]
+        assert np.allclose(
+            grid_stats.loc["cagr":, k].astype(np.float64),
+            expected.loc["cagr":].astype(np.float64),
+        )
+
+
+def _load_test_data(filename, dtype=float):
+    wd = os.getcwd()
+    return pd.read_csv(
+        f"{wd}/tests/data/{filename}",
+        index_col="dt",
+        parse_dates=["dt"],
+        dtype=dtype,
+    )
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import alphasim.backtest as bt
+import alphasim.stats as stats
+from alphasim.parallel import backtest_parallel
+
+
+def test_backtest_parallel():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+    funding = weights.abs() * 0.0001
+
+    jobs = [
+        (weights, dict(trade_buffer=0.1)),
+        (weights.iloc[:, ::-1], dict(trade_buffer=0.05, discrete_shares=True)),
+        (weights * 0.5, dict(short_f=0.5)),
+    ]
+
+    results = dict(
+        backtest_parallel(
+            prices, jobs, funding_rates=funding, max_workers=2, chunksize=2
+        )
+    )
+
+    assert sorted(results) == [0, 1, 2]
+    for i, (w, kwargs) in enumerate(jobs):
+        result = bt.backtest(prices, w, funding_rates=funding, **kwargs)
+        expected = stats.backtest_stats(result)
+        assert np.allclose(
+            results[i].loc["cagr":].astype(np.float64),
+            expected.loc["cagr":].astype(np.float64),
+        )
+
+
+def test_backtest_parallel_frame():
+    prices = _load_test_data("stonk_prices.csv").iloc[:100]
+    weights = _load_test_data("stonk_weights.csv").iloc[:100]
+
+    jobs = [(weights, dict(trade_buffer=0.1))]
+    results = dict(backtest_parallel(prices, jobs, output="frame", max_workers=1))
+
+    assert results[0].equals(bt.backtest(prices, weights, trade_buffer=0.1))
+
+    # More jobs than may be in flight are submitted as earlier ones complete
+    jobs = [(weights, dict(trade_buffer=0.01 * i)) for i in range(5)]
+    results = dict(backtest_parallel(prices, jobs, output="summary", max_workers=1))
+    assert sorted(results) == list(range(5))
+
+    # A bad job fails before any job is run
+    jobs.append((weights, dict(output="frame")))
+    with pytest.raises(ValueError):
+        next(backtest_parallel(prices, jobs, max_workers=1))
+
+
+def _load_test_data(filename, dtype=float):
+    wd = os.getcwd()
+    return pd.read_csv(
+        f"{wd}/tests/data/{filename}",
+        index_col="dt",
+        parse_dates=["dt"],
+        dtype=dtype,
+    )
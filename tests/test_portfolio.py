@@ -1,7 +1,21 @@
+import os
+
 import numpy as np
 import pandas as pd
-
-from alphasim.portfolio import _discretize, allocate, distribute_longshort
+import pytest
+
+import alphasim.const as const
+from alphasim.portfolio import (
+    _discretize,
+    allocate,
+    allocate_array,
+    cap_weights,
+    distribute_longshort,
+    instrument_table,
+    to_instruments,
+    to_weights,
+    to_weights_frame,
+)
 from alphasim.util import like
 
 
@@ -32,6 +46,74 @@ def test_distribute():
     assert x.max() <= 0.2
 
 
+def test_cap_weights():
+    weights = pd.DataFrame(
+        [
+            [0.5, -0.3, 0.1, 0.1, np.nan],
+            [0.1, 0.1, -0.1, 0.1, 0.1],
+            [-0.9, 0.1, 0, 0, 0],
+            [0.45, 0.45, 0.05, 0.05, 0],
+        ],
+        columns=["FOO", "BAR", "BAZ", "QUX", "QUUX"],
+    )
+
+    capped, status = cap_weights(weights, max=0.3)
+    print(capped.round(4))
+
+    assert status.tolist() == ["ok", "ok", "fallback", "ok"]
+    ok = status == "ok"
+    assert (capped[ok].fillna(0).abs() <= 0.3 + 1e-12).all(None)
+    assert np.allclose(capped[ok].abs().sum(axis=1), weights[ok].abs().sum(axis=1))
+    assert (np.sign(capped[ok].fillna(0)) == np.sign(weights[ok].fillna(0))).all(None)
+    assert np.isnan(capped.loc[0, "QUUX"])
+
+    # Excess is redistributed proportional to the uncapped weights
+    assert np.allclose(capped.loc[0].tolist()[:4], [0.3, -0.3, 0.2, 0.2])
+    assert capped.loc[1].equals(weights.loc[1])
+    assert np.allclose(capped.loc[3], [0.3, 0.3, 0.2, 0.2, 0])
+
+    # Rows short of nonzero weights fall back to weighting the zero assets
+    capped, status = cap_weights(pd.DataFrame([[0.6, -0.4, 0, 0, 0]]), max=0.3)
+    assert status.tolist() == ["fallback"]
+    assert np.allclose(capped.loc[0], [0.3, -0.3, 0.4 / 3, 0.4 / 3, 0.4 / 3])
+
+    # Infeasible rows are capped at the max and fail without solving
+    infeasible = pd.DataFrame(np.tile([0.6, -0.4, np.nan], (2000, 1)))
+    capped, status = cap_weights(infeasible, max=0.3)
+    assert (status == "failed").all()
+    assert np.allclose(capped.abs().sum(axis=1), 0.6)
+
+
+def test_to_weights_frame():
+    wd = os.getcwd()
+    mask = pd.read_csv(
+        f"{wd}/tests/data/crypto_mask.csv", index_col="dt", parse_dates=["dt"]
+    )
+    forecasts = pd.read_csv(
+        f"{wd}/tests/data/crypto_weights.csv", index_col="dt", parse_dates=["dt"]
+    )
+    prices = pd.read_csv(
+        f"{wd}/tests/data/crypto_prices.csv", index_col="dt", parse_dates=["dt"]
+    )
+
+    weights = to_weights_frame(forecasts)
+    assert not weights.isna().to_numpy().any()
+    for dt in forecasts.index[[0, 500, -1]]:
+        assert np.allclose(weights.loc[dt], to_weights(forecasts.loc[dt]).fillna(0))
+
+    weights = to_weights_frame(forecasts, max_weight=0.1, prices=prices, mask=mask)
+    assert (weights.to_numpy()[~mask.to_numpy()] == 0).all()
+    assert (weights.abs().to_numpy() <= 0.1 + 1e-12).all()
+    total = weights.abs().sum(axis=1)
+    assert np.allclose(total[total > 0], 1)
+    assert (total.iloc[: const.EWMA_WARMUP] == 0).all()
+
+    # Rows that cannot be capped are kept capped at the max with a warning
+    with pytest.warns(RuntimeWarning):
+        weights = to_weights_frame(forecasts.iloc[:, :3], max_weight=0.1)
+    assert (weights.abs().to_numpy() <= 0.1 + 1e-12).all()
+
+
 def test_allocate():
     capital = 1000
     prices = pd.Series({"FOO": 100, "BAR": 100})
@@ -138,6 +220,49 @@ def test_allocate_tradebuffer_and_shortf():
     assert np.array_equal(quote_qty.sort_index(), [-180, 150])
 
 
+def test_allocate_instruments():
+    capital = 1000
+    prices = pd.Series({"FOO": 33.337, "BAR": 100})
+    port = pd.Series({"FOO": 0, "BAR": 0})
+    weights = pd.Series({"FOO": 0.5, "BAR": -0.004})
+
+    instruments = instrument_table(
+        ["FOO", "BAR"], lot_step=[0.1, 0.01], min_notional=[0, 10]
+    )
+    instruments.loc["FOO", "price_precision"] = 2
+
+    rebal = allocate(capital, prices, port, weights, instruments=instruments)
+    (_, _, _, _, base_qty, quote_qty) = rebal
+    print(base_qty, quote_qty)
+
+    # FOO is priced at 33.34 in lots of 3.334, BAR is below the min notional
+    assert np.array_equal(base_qty.sort_index(), [0, 14.9])
+    assert np.allclose(quote_qty.sort_index(), [0, 14.9 * 33.34])
+
+    defaults = to_instruments(instruments[["lot_step"]], ["BAR"])
+    assert defaults.size_precision[0] == const.TRADE_SIZE_PREC
+    assert np.isnan(defaults.price_precision[0])
+
+
+def test_allocate_array():
+    capital = np.array([[1000], [2000]])
+    prices = np.array([100.0, 100.0])
+    port = np.array([[0.0, 0.0], [0.0, 0.0]])
+    weights = np.array([-0.4, 0.2])
+    trade_buffer = np.array([[0.05], [0]])
+
+    out = tuple(np.empty((2, 2)) for _ in range(5))
+    rebal = allocate_array(
+        capital, prices, port, weights, trade_buffer, 10.0, short_f=0.5, out=out
+    )
+    (_, _, adj_delta_weight, base_qty, quote_qty) = rebal
+
+    assert all(x is y for x, y in zip(rebal, out))
+    assert np.array_equal(adj_delta_weight.round(3), [[-0.175, 0.15], [-0.2, 0.2]])
+    assert np.array_equal(base_qty, [[-1.8, 1.5], [-4, 4]])
+    assert np.array_equal(quote_qty, [[-180, 150], [-400, 400]])
+
+
 def test_discretize():
     capital = 1000.003
     lots = pd.Series({"FOO": 1, "BAR": 1})
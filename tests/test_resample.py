@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import alphasim.backtest as bt
+import alphasim.stats as stats
+from alphasim.resample import bootstrap_paths, bootstrap_stats, path_stats
+
+
+def test_path_stats():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+    result = bt.backtest(prices, weights, trade_buffer=0.1, output="summary")
+
+    returns = stats.backtest_returns(result).dropna().to_numpy()
+    years = (result.index[-1] - result.index[0]).days / 365
+    actual = path_stats(returns[None, :], years, 252).iloc[0]
+
+    expected = stats.backtest_stats(result)["result"]
+    assert np.allclose(
+        expected[actual.index].astype(np.float64), actual.astype(np.float64)
+    )
+
+
+def test_bootstrap_paths():
+    returns = np.arange(100, dtype=np.float64)
+    rng = np.random.default_rng(1)
+
+    for method in ["block", "stationary"]:
+        paths = bootstrap_paths(returns, 50, 10, method, rng)
+        assert paths.shape == (50, 100)
+        assert np.isin(paths, returns).all()
+
+    blocks = bootstrap_paths(returns, 50, 10, "block", rng).reshape(50, 10, 10)
+    assert (np.diff(blocks, axis=2) == 1).all()
+
+
+def test_bootstrap_stats():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+    result = bt.backtest(prices, weights, output="summary")
+
+    boot = bootstrap_stats(
+        result, paths=300, method="stationary", seed=7, chunksize=100
+    )
+    assert boot.stats.shape[0] == 300
+    assert boot.quantiles.index.tolist() == [0.05, 0.5, 0.95]
+    assert (boot.quantiles["max_drawdown"] <= 0).all()
+
+    pooled = bootstrap_stats(
+        result, paths=300, method="stationary", seed=7, chunksize=100, max_workers=2
+    )
+    assert boot.stats.equals(pooled.stats)
+
+    with pytest.raises(ValueError):
+        bootstrap_stats(result, method="iid")
+
+
+def _load_test_data(filename, dtype=float):
+    wd = os.getcwd()
+    return pd.read_csv(
+        f"{wd}/tests/data/{filename}",
+        index_col="dt",
+        parse_dates=["dt"],
+        dtype=dtype,
+    )
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import alphasim.backtest as bt
+import alphasim.stats as stats
+from alphasim.result import BacktestResult
+
+
+def test_result_to_frame():
+    prices = pd.DataFrame([10, 15, 30], columns=["Acme"])
+    weights = pd.DataFrame([1, 1, 0], columns=["Acme"])
+
+    result = bt.backtest(prices, weights, output="result")
+    assert isinstance(result, BacktestResult)
+    assert result.fields[bt.EQUITY].dtype == np.float64
+    assert result.fields["is_trade"].dtype == bool
+
+    frame = result.to_frame()
+    assert frame is result.to_frame()
+    assert frame.equals(bt.backtest(prices, weights))
+
+    assert frame.loc[(0, bt.CASH)]["end_portfolio"] == 0
+    assert frame.loc[(2, bt.CASH)]["end_portfolio"] == 2500
+    assert result["end_portfolio"].loc[0, "Acme"] == 100
+
+
+def test_result_stats():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+
+    result = bt.backtest(
+        prices, weights, trade_buffer=0.1, discrete_shares=True, output="result"
+    )
+    frame = result.to_frame()
+
+    summary = frame.groupby(level=0).sum()
+    assert np.allclose(result.summary(), summary, equal_nan=True)
+
+    expected = stats.backtest_stats(frame, benchmark=prices[["VTI"]])
+    actual = stats.backtest_stats(result, benchmark=prices[["VTI"]])
+    assert expected.index.equals(actual.index)
+    assert np.allclose(
+        expected.loc["cagr":].astype(np.float64),
+        actual.loc["cagr":].astype(np.float64),
+        equal_nan=True,
+    )
+
+
+def test_result_summary_output():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+    kwargs = dict(trade_buffer=0.1, discrete_shares=True)
+
+    summary = bt.backtest(prices, weights, output="summary", **kwargs)
+    assert summary.fields is None
+    with pytest.raises(ValueError):
+        summary.to_frame()
+
+    expected = stats.backtest_stats(bt.backtest(prices, weights, **kwargs))
+    actual = stats.backtest_stats(summary)
+    assert np.allclose(
+        expected.loc["cagr":].astype(np.float64),
+        actual.loc["cagr":].astype(np.float64),
+        equal_nan=True,
+    )
+
+
+def _load_test_data(filename, dtype=float):
+    wd = os.getcwd()
+    return pd.read_csv(
+        f"{wd}/tests/data/{filename}",
+        index_col="dt",
+        parse_dates=["dt"],
+        dtype=dtype,
+    )
@@ -0,0 +1,63 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import alphasim.backtest as bt
+import alphasim.money as mn
+from alphasim.session import BacktestSession
+
+
+def test_session_step():
+    prices = _load_test_data("stonk_prices.csv").iloc[:250]
+    weights = _load_test_data("stonk_weights.csv").iloc[:250]
+    kwargs = dict(trade_buffer=0.1, discrete_shares=True, money_func=mn.total_equity)
+
+    session = BacktestSession(weights.columns, **kwargs)
+    records = [
+        session.step(prices.iloc[i], weights.iloc[i]) for i in range(len(weights))
+    ]
+
+    expected = bt.backtest(prices, weights, **kwargs)
+    assert pd.concat(records).equals(expected)
+    assert session.periods == len(weights)
+
+
+def test_session_resume():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+    kwargs = dict(trade_buffer=0.1, money_func=mn.sqrt_profit)
+
+    session = BacktestSession(weights.columns, **kwargs)
+    head = session.run(prices.iloc[:1500], weights.iloc[:1500])
+
+    checkpoint = pickle.loads(pickle.dumps(session.checkpoint()))
+    resumed = BacktestSession.from_checkpoint(checkpoint, **kwargs)
+    tail = resumed.run(prices.iloc[1500:], weights.iloc[1500:])
+
+    expected = bt.backtest(prices, weights, **kwargs)
+    assert pd.concat([head, tail]).equals(expected)
+    assert resumed.periods == len(weights)
+
+
+def test_session_rekt():
+    session = BacktestSession(["Acme"])
+    weights = pd.Series([-2], index=["Acme"])
+
+    for price in [10, 10, 30]:
+        record = session.step(pd.Series([price], index=["Acme"]), weights)
+
+    assert record is None
+    assert session.rekt
+    assert np.isclose(session.cash, 3000)
+
+
+def _load_test_data(filename, dtype=float):
+    wd = os.getcwd()
+    return pd.read_csv(
+        f"{wd}/tests/data/{filename}",
+        index_col="dt",
+        parse_dates=["dt"],
+        dtype=dtype,
+    )
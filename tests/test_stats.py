@@ -0,0 +1,142 @@
+import os
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import alphasim.backtest as bt
+import alphasim.money as mn
+import alphasim.stats as stats
+from alphasim.result import BacktestResult
+from alphasim.session import BacktestSession
+
+
+def test_streaming_stats():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+    kwargs = dict(trade_buffer=0.1, money_func=mn.total_equity)
+
+    session = BacktestSession(weights.columns, stats=stats.StreamingStats(), **kwargs)
+    session.run(prices.iloc[:1000], weights.iloc[:1000], output="summary")
+    for i in range(1000, 1100):
+        session.step(prices.iloc[i], weights.iloc[i])
+    session.run(prices.iloc[1100:], weights.iloc[1100:], output="summary")
+
+    expected = stats.backtest_stats(bt.backtest(prices, weights, **kwargs))
+    actual = session.stats.stats()
+    assert expected.index.equals(actual.index)
+    assert (expected.loc[:"risk_free_rate"] == actual.loc[:"risk_free_rate"]).all(None)
+    assert np.allclose(
+        expected.loc["initial":].astype(np.float64),
+        actual.loc["initial":].astype(np.float64),
+        equal_nan=True,
+    )
+
+
+def test_streaming_stats_grid():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+    params = [dict(trade_buffer=0), dict(trade_buffer=0.2, initial_capital=500)]
+
+    results = bt.backtest_grid(prices, weights, params, output="result")
+
+    acc = stats.StreamingStats(columns=range(len(params)))
+    for i, period in enumerate(weights.index):
+        totals = {
+            key: np.array([r.totals[key][i] for r in results])
+            for key in results[0].totals
+        }
+        acc.update(period, totals)
+
+    expected = bt.backtest_grid(prices, weights, params)
+    assert np.allclose(
+        expected.loc["initial":].astype(np.float64),
+        acc.stats().loc["initial":].astype(np.float64),
+        equal_nan=True,
+    )
+
+
+def test_rolling_stats():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+
+    result = bt.backtest(prices, weights, trade_buffer=0.1, output="summary")
+    keys = ["cagr", "ann_volatility", "skew", "kurtosis", "max_drawdown"]
+    keys += ["ann_turnover"]
+
+    rolling = stats.rolling_stats(result, window=250, step=100)
+    assert rolling.index[0] == weights.index[249]
+    for end in [249, 749, 1549]:
+        expected = _window_stats(result, end - 249, end + 1)
+        actual = rolling.loc[weights.index[end], keys]
+        assert np.allclose(expected[keys].astype(np.float64), actual)
+
+    expanding = stats.rolling_stats(result)
+    for end in [100, 1000, len(weights) - 1]:
+        expected = _window_stats(result, 0, end + 1)
+        actual = expanding.loc[weights.index[end], keys]
+        assert np.allclose(expected[keys].astype(np.float64), actual)
+
+
+def test_rolling_stats_long():
+    periods, window = 200_000, 50_000
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2000-01-01", periods=periods, freq="H")
+    equity = 1000 * np.exp(np.cumsum(rng.normal(0, 0.001, periods)))
+    totals = {key: np.zeros(periods) for key in ["buy_value", "sell_value"]}
+    totals["equity"] = equity
+    result = BacktestResult(
+        index, pd.Index([]), None, totals, equity, equity, 1000, periods
+    )
+
+    tracemalloc.start()
+    rolling = stats.rolling_stats(result, window=window, step=2_500, freq_unit="H")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Memory is bounded by the chunk size rather than the windows x window
+    assert peak < 2**27
+    assert len(rolling) == (periods - window) // 2_500 + 1
+    for end in [window - 1, 100_000 - 1, periods - 1]:
+        x = equity[end - window + 1 : end + 1]
+        expected = (x / np.maximum.accumulate(x) - 1).min()
+        assert rolling.loc[index[end], "max_drawdown"] == expected
+
+
+def test_benchmark_stats():
+    prices = _load_test_data("stonk_prices.csv")
+    weights = _load_test_data("stonk_weights.csv")
+    result = bt.backtest(prices, weights, output="summary")
+
+    benchmark = prices.copy()
+    benchmark["equal_weight"] = (prices / prices.iloc[0]).mean(axis=1)
+
+    df = stats.backtest_stats(result, benchmark=benchmark)
+    assert df.columns.tolist() == benchmark.columns.tolist() + ["backtest"]
+
+    for asset in benchmark.columns:
+        expected = stats.backtest_stats(result, benchmark=benchmark[[asset]])
+        assert expected.columns.tolist() == ["benchmark", "backtest"]
+        assert np.allclose(
+            expected.loc["initial":, "benchmark"].astype(np.float64),
+            df.loc["initial":, asset].astype(np.float64),
+            equal_nan=True,
+        )
+
+
+def _window_stats(result, start, end):
+    totals = {
+        key: pd.DataFrame(values[start:end], index=result.index[start:end])
+        for key, values in result.totals.items()
+    }
+    return stats.summary_stats(totals)[0]
+
+
+def _load_test_data(filename, dtype=float):
+    wd = os.getcwd()
+    return pd.read_csv(
+        f"{wd}/tests/data/{filename}",
+        index_col="dt",
+        parse_dates=["dt"],
+        dtype=dtype,
+    )